@@ -1,9 +1,20 @@
 from .loggable import getLogger
+from array import array
+from functools import partial
+from heapq import heappush, heappop
+from itertools import count
 from math import sqrt, cos, sin, pi
 import pygame
 import sys
 
-__all__ = ('Task', 'Animation', 'remove_animations_of')
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ('Task', 'Scheduler', 'Animation', 'AnimationGroup',
+           'AnimationEngine', 'AnimationTransition',
+           'get_transition', 'remove_animations_of')
 
 logger = getLogger('animation')
 
@@ -18,15 +29,69 @@ else:
     string_types = text_type = str
 
 
+TABLE_RESOLUTION = 1024
+TRANSITION_TABLES = {}
+
+
+def make_transition_table(transition, resolution=TABLE_RESOLUTION):
+    """Sample a transition into a lookup table
+
+    Returns a function that approximates the transition by linear
+    interpolation between resolution + 1 evenly spaced samples.  The
+    values at 0 and 1 are exact.
+
+    :param transition: function taking progress in the range 0-1
+    :param resolution: number of intervals between samples
+    :return: function
+    """
+    samples = [transition(i / float(resolution)) for i in range(resolution)]
+    samples.append(transition(1.))
+    slopes = [b - a for a, b in zip(samples, samples[1:])] + [0.]
+
+    def lookup(progress):
+        x = progress * resolution
+        i = int(x)
+        return samples[i] + slopes[i] * (x - i)
+
+    lookup.samples = samples
+    return lookup
+
+
+def get_transition(transition, table=False):
+    """Return a transition function
+
+    :param transition: name of an AnimationTransition, or a function
+    :param table: return the lookup table version of the transition
+    :return: function
+    """
+    if isinstance(transition, string_types):
+        name = transition
+        transition = getattr(AnimationTransition, name)
+    else:
+        name = transition
+    if table:
+        if name not in TRANSITION_TABLES:
+            TRANSITION_TABLES[name] = make_transition_table(transition)
+        return TRANSITION_TABLES[name]
+    return transition
+
+
 def remove_animations_of(group, target):
     """Find animations that target objects and remove those animations
 
+    An AnimationGroup looks them up in its index; any other group is
+    searched.
+
     :param group: pygame.sprite.Group
     :param target: any
     :return: None
     """
+    if isinstance(group, AnimationGroup):
+        group.remove_animations_of(target)
+        return
     animations = [ani for ani in group.sprites() if isinstance(ani, Animation)]
-    to_remove = [ani for ani in animations if target in ani.targets]
+    to_remove = [ani for ani in animations if ani.targets and
+                 any(target is other for other, _ in ani.targets)]
     group.remove(*to_remove)
 
 
@@ -108,6 +173,192 @@ class Task(pygame.sprite.Sprite):
             task.add(*groups)
 
 
+class AnimationGroup(pygame.sprite.Group):
+    """A sprite group for Animations indexed by their targets
+
+    Finding the animations of a target in a plain group means checking
+    the targets of every animation in it.  This group keeps an index
+    from each target to its animations, updated as animations are
+    started, added and removed, so removing or finishing the animations
+    of many targets at once costs in proportion to the animations being
+    removed.
+
+        animations = AnimationGroup()
+        ...
+        animations.remove_animations_of(*destroyed_enemies)
+
+    Targets are indexed by identity, so unhashable targets such as
+    Rects work.  An entry only exists while one of its animations is
+    in the group (and so keeps the target alive), so the index never
+    holds on to targets itself.
+    """
+    def __init__(self, *sprites):
+        self._by_target = {}
+        self._indexed = {}
+        super(AnimationGroup, self).__init__(*sprites)
+
+    def add_internal(self, sprite, *args):
+        super(AnimationGroup, self).add_internal(sprite, *args)
+        self._index(sprite)
+
+    def remove_internal(self, sprite):
+        super(AnimationGroup, self).remove_internal(sprite)
+        self._unindex(sprite)
+
+    def _index(self, animation):
+        """Index a started animation under each of its targets"""
+        if getattr(animation, 'targets', None) is None:
+            return
+        self._unindex(animation)
+        keys = [id(target) for target, _ in animation.targets]
+        self._indexed[animation] = keys
+        for key in keys:
+            self._by_target.setdefault(key, set()).add(animation)
+
+    def _unindex(self, animation):
+        for key in self._indexed.pop(animation, ()):
+            animations = self._by_target[key]
+            animations.discard(animation)
+            if not animations:
+                del self._by_target[key]
+
+    def animations_of(self, *targets):
+        """Return the animations of any of targets
+
+        :param targets: any
+        :return: list of Animations
+        """
+        found = set()
+        for target in targets:
+            found.update(self._by_target.get(id(target), ()))
+        return list(found)
+
+    def remove_animations_of(self, *targets):
+        """Cancel the animations of targets, leaving their values as they are
+
+        :param targets: any
+        :return: None
+        """
+        self.remove(*self.animations_of(*targets))
+
+    def finish_animations_of(self, *targets):
+        """Finish the animations of targets, applying their final values
+
+        :param targets: any
+        :return: None
+        """
+        for animation in self.animations_of(*targets):
+            animation.finish()
+
+
+class Scheduler(object):
+    """Run many Tasks without updating each of them every frame
+
+    A Task in a sprite group advances its own timer on every update.
+    A Scheduler instead keeps tasks in a heap ordered by the time they
+    are next due, so an update only looks at the tasks that fire and
+    costs the same however many tasks are waiting.
+
+        scheduler = Scheduler()
+        task = scheduler.add(Task(call_later, 1000, 24))
+        task.chain(Task(something_else))
+        ...
+        scheduler.update(dt)
+        scheduler.remove(task)      # cancel it
+
+    Tasks keep the meaning they have in groups: a task fires at most
+    once per update, and chained tasks are added when it finishes.
+    Every State has a scheduler that its StateMachine updates and
+    clears when the state is cleaned up.
+    """
+    def __init__(self):
+        self.time = 0
+        self._queue = []
+        self._entries = {}
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, task):
+        return task in self._entries
+
+    def add(self, task):
+        """Schedule a Task to first fire its interval from now
+
+        :param task: Task instance
+        :return: the task
+        """
+        self._push(task, self.time + task.interval)
+        return task
+
+    def schedule(self, callback, interval=0, loops=1, args=None, kwargs=None):
+        """Create and add a Task; arguments are the same as for Task
+
+        :return: Task instance
+        """
+        return self.add(Task(callback, interval, loops, args, kwargs))
+
+    def _push(self, task, due):
+        entry = [due, next(self._counter), task]
+        self._entries[task] = entry
+        heappush(self._queue, entry)
+
+    def remove(self, task):
+        """Cancel a task so that it no longer fires, nor do its chained tasks
+
+        :param task: Task instance
+        :return: None
+        """
+        entry = self._entries.pop(task, None)
+        if entry is not None:
+            # Left in the heap and skipped when it comes up.
+            entry[2] = None
+
+    def clear(self):
+        """Cancel every task
+
+        :return: None
+        """
+        self._queue = []
+        self._entries.clear()
+
+    def update(self, dt):
+        """Fire the tasks that have come due
+
+        The unit of time passed must match the one used for the
+        task intervals.
+
+        :param dt: Time passed since last update.
+        """
+        self.time += dt
+        queue = self._queue
+        repeat = []
+        while queue and queue[0][0] <= self.time:
+            entry = heappop(queue)
+            due, _, task = entry
+            if task is None:
+                continue
+            task.callback(*task._args, **task._kwargs)
+            if self._entries.get(task) is not entry:
+                # Removed or added again by its own callback.
+                continue
+            del self._entries[task]
+            if task._loops != -1:
+                task._loops -= 1
+                if task._loops <= 0:
+                    # Pushed after the loop so they first fire on a
+                    # later update, as they would in a group.
+                    repeat.extend((other, self.time + other.interval)
+                                  for other in task._chain)
+                    task._chain = None
+                    continue
+            repeat.append((task, due + task.interval))
+        for task, due in repeat:
+            if task not in self._entries:
+                self._push(task, due)
+
+
 class Animation(pygame.sprite.Sprite):
     """Change numeric values over time
 
@@ -162,6 +413,15 @@ class Animation(pygame.sprite.Sprite):
     If you are using pygame rects are a target, you should pass
     'round_values=True' to the constructor to avoid jitter caused
     by integer truncation.
+
+
+    Lookup Tables
+    =============
+
+    Pass 'table=True' to evaluate the transition by interpolating
+    in a precomputed table of samples (see get_transition) rather
+    than calling it.  This is cheaper for the elastic, bounce and
+    other trigonometric transitions, at the cost of a small error.
     """
     def __init__(self, **kwargs):
         super(Animation, self).__init__()
@@ -170,13 +430,12 @@ class Animation(pygame.sprite.Sprite):
         self._started = False
         self._round_values = kwargs.get('round_values', False)
         self._duration = float(kwargs.get('duration', 1000.))
-        self._transition = kwargs.get('transition', 'linear')
+        self._transition = get_transition(kwargs.get('transition', 'linear'),
+                                          kwargs.get('table', False))
         self._initial = kwargs.get('initial', None)
-        if isinstance(self._transition, string_types):
-            self._transition = getattr(AnimationTransition, self._transition)
         self._elapsed = 0.
         for key in ('duration', 'transition', 'round_values', 'delay',
-                    'initial'):
+                    'initial', 'table'):
             kwargs.pop(key, None)
         self.props = kwargs
 
@@ -295,6 +554,215 @@ class Animation(pygame.sprite.Sprite):
             for name, value in self.props.items():
                 initial = self._get_value(target, name)
                 props[name] = initial, value
+        for group in self.groups():
+            if isinstance(group, AnimationGroup):
+                group._index(self)
+
+
+class AnimationEngine(object):
+    """Advance many tweens at once
+
+    Animation is a sprite per tween and resolves its targets and
+    transition on every update.  AnimationEngine instead keeps every
+    active tween as one row of a set of contiguous arrays (start, end,
+    elapsed, duration, delay, transition id) and advances all of them
+    in a single pass per update.  A value is only written back to its
+    target when it differs from the last value written, so tweens with
+    round_values only touch their targets when the integer changes.
+
+        engine = AnimationEngine()
+        engine.animate(sprite.rect, x=100, y=100, duration=350,
+                       transition='in_out_quint', round_values=True)
+        ...
+        engine.update(dt)
+
+    Tweens started by the same animate call share their progress, so
+    the transition is only evaluated once for all of them.  Like
+    Animation, target attributes may be callables taking the value.
+    """
+    def __init__(self):
+        self._transitions = []
+        self._transition_ids = {}
+        self._start = array('d')
+        self._end = array('d')
+        self._elapsed = array('d')
+        self._duration = array('d')
+        self._delay = array('d')
+        self._transition = array('i')
+        self._round = array('b')
+        self._last = array('d')
+        self._batch = array('l')
+        self._setters = []
+        self._targets = []
+        self._callbacks = {}
+        self._next_batch = 0
+
+    def __len__(self):
+        return len(self._setters)
+
+    def _get_transition_id(self, transition, table=False):
+        transition = get_transition(transition, table)
+        if transition not in self._transition_ids:
+            self._transition_ids[transition] = len(self._transitions)
+            self._transitions.append(transition)
+        return self._transition_ids[transition]
+
+    @staticmethod
+    def _make_setter(target, name):
+        attr = getattr(target, name)
+        if callable(attr):
+            return attr
+        return partial(setattr, target, name)
+
+    def animate(self, target, duration=1000., transition='linear',
+                round_values=False, delay=0, callback=None, table=False,
+                **props):
+        """Start tweening the named attributes of target to new values
+
+        The keyword arguments have the same meaning as for Animation,
+        except that callable attributes take their initial value from
+        calling them, or 0 if that returns None.
+
+        :param target: Any valid python object
+        :param callback: Called once all of these tweens have finished
+        :return: id of the batch of tweens, for cancel
+        """
+        batch = self._next_batch
+        self._next_batch += 1
+        transition_id = self._get_transition_id(transition, table)
+        for name, value in props.items():
+            initial = getattr(target, name)
+            if callable(initial):
+                initial = initial() or 0
+            self._start.append(initial)
+            self._end.append(value)
+            self._elapsed.append(0.)
+            self._duration.append(float(duration))
+            self._delay.append(delay)
+            self._transition.append(transition_id)
+            self._round.append(bool(round_values))
+            self._last.append(initial)
+            self._batch.append(batch)
+            self._setters.append(self._make_setter(target, name))
+            self._targets.append(target)
+        if callback is not None:
+            self._callbacks[batch] = callback
+        return batch
+
+    def cancel(self, batch):
+        """Stop a batch of tweens where they are, without calling back
+
+        :param batch: id returned by animate
+        :return: None
+        """
+        self._callbacks.pop(batch, None)
+        self._compact([i for i, b in enumerate(self._batch) if b != batch])
+
+    def update(self, dt):
+        """Advance every tween by dt
+
+        The unit of time passed must match the one used for the
+        durations.
+
+        :param dt: Time passed since last update.
+        """
+        if not self._setters:
+            return
+        if numpy is None:
+            finished = self._update_rows(dt)
+        else:
+            finished = self._update_vectorized(dt)
+        if finished:
+            self._finish(finished)
+
+    def _update_rows(self, dt):
+        """Advance the tweens one row at a time; used without numpy"""
+        start, end, last = self._start, self._end, self._last
+        elapsed, duration, delay = self._elapsed, self._duration, self._delay
+        transitions, transition_ids = self._transitions, self._transition
+        rounds, setters = self._round, self._setters
+        eased = {}
+        finished = []
+        for i in range(len(setters)):
+            e = elapsed[i] + dt
+            elapsed[i] = e
+            if e < delay[i]:
+                continue
+            p = (e - delay[i]) / duration[i]
+            if p >= 1.:
+                p = 1.
+                finished.append(i)
+            key = (transition_ids[i], p)
+            t = eased.get(key)
+            if t is None:
+                t = eased[key] = transitions[key[0]](p)
+            value = start[i] * (1. - t) + end[i] * t
+            if rounds[i]:
+                value = int(round(value, 0))
+            if value != last[i]:
+                last[i] = value
+                setters[i](value)
+        return finished
+
+    def _update_vectorized(self, dt):
+        """Advance all tweens with numpy operations on views of the arrays
+
+        The transition is evaluated once per distinct progress value of
+        each transition in use, so batches cost a single call; lookup
+        table transitions are interpolated for all rows at once.
+        """
+        view = lambda column: numpy.frombuffer(column, column.typecode)
+        elapsed, delay, last = (view(self._elapsed), view(self._delay),
+                                view(self._last))
+        elapsed += dt
+        active = elapsed >= delay
+        p = numpy.clip((elapsed - delay) / view(self._duration), 0., 1.)
+        t = numpy.empty_like(p)
+        transition_ids = view(self._transition)
+        for transition_id in numpy.unique(transition_ids):
+            rows = transition_ids == transition_id
+            transition = self._transitions[transition_id]
+            samples = getattr(transition, 'samples', None)
+            if samples is not None:
+                grid = numpy.linspace(0., 1., len(samples))
+                t[rows] = numpy.interp(p[rows], grid, samples)
+                continue
+            progress, inverse = numpy.unique(p[rows], return_inverse=True)
+            eased = numpy.array([transition(x) for x in progress.tolist()])
+            t[rows] = eased[inverse]
+        values = view(self._start) * (1. - t) + view(self._end) * t
+        rounds = view(self._round).astype(bool)
+        values[rounds] = numpy.round(values[rounds])
+        changed = numpy.flatnonzero(active & (values != last))
+        last[changed] = values[changed]
+        setters = self._setters
+        for i, value, rounded in zip(changed.tolist(),
+                                     values[changed].tolist(),
+                                     rounds[changed].tolist()):
+            setters[i](int(value) if rounded else value)
+        return numpy.flatnonzero(active & (p >= 1.)).tolist()
+
+    def _finish(self, finished):
+        finished = set(finished)
+        batches = set(self._batch[i] for i in finished)
+        self._compact([i for i in range(len(self._setters))
+                       if i not in finished])
+        for batch in batches.difference(self._batch):
+            callback = self._callbacks.pop(batch, None)
+            if callback is not None:
+                callback()
+
+    def _compact(self, keep):
+        """Keep only the rows of the tween arrays at the indices in keep"""
+        if len(keep) == len(self._setters):
+            return
+        for name in ('_start', '_end', '_elapsed', '_duration', '_delay',
+                     '_transition', '_round', '_last', '_batch'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode,
+                                      [column[i] for i in keep]))
+        self._setters = [self._setters[i] for i in keep]
+        self._targets = [self._targets[i] for i in keep]
 
 
 class AnimationTransition(object):
@@ -575,3 +1043,11 @@ class AnimationTransition(object):
             return AnimationTransition._in_bounce_internal(p, 1.) * .5
         return AnimationTransition._out_bounce_internal(p - 1., 1.) * .5 + .5
 
+
+TRANSITION_NAMES = tuple(sorted(name for name in vars(AnimationTransition)
+                                if not name.startswith('_')))
+
+# Sample every named transition at import so tables are ready to use.
+TRANSITION_TABLES.update(
+    (name, make_transition_table(getattr(AnimationTransition, name)))
+    for name in TRANSITION_NAMES)
@@ -19,6 +19,7 @@ BUTTON_DEFAULTS = {"call"               : None,
                    "hover_image"        : None,
                    "disable_image"      : None,
                    "hover_sound"        : None,
+                   "hover_call"         : None,
                    "click_sound"        : None,
                    "visible"            : True,
                    "active"             : True,
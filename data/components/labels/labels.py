@@ -6,6 +6,7 @@ TODO: needs some cleaning up, consolidation, and documentation.
 """
 
 import string
+import hashlib
 import textwrap
 
 import pygame as pg
@@ -18,13 +19,15 @@ __all__ = [
     "Label",
     "MultiLineLabel",
     "ButtonGroup",
+    "SpatialButtonGroup",
     "Button",
     "TextBox",
     "FlashingText"
 ]
     
 
-LOADED_FONTS = {}
+LOADED_FONTS = tools.FONT_CACHE
+BUTTON_IMAGES = tools.SurfaceCache(4*1024*1024)
 
 
 class Label(pg.sprite.Sprite):
@@ -40,9 +43,7 @@ class Label(pg.sprite.Sprite):
     def __init__(self, path, size, text, color, rect_attr, bg=None):
         super(Label, self).__init__()
         self.path, self.size = path, size
-        if (path, size) not in LOADED_FONTS:
-            LOADED_FONTS[(path, size)] = pg.font.Font(path, size)
-        self.font = LOADED_FONTS[(path, size)]
+        self.font = LOADED_FONTS.get(path, size)
         self.bg = tools.parse_color(bg)
         self.color = tools.parse_color(color)
         self.rect_attr = rect_attr
@@ -59,11 +60,8 @@ class Label(pg.sprite.Sprite):
         """
         Update the surface using the current properties and text.
         """
-        if self.bg:
-            render_args = (self.text, True, self.color, self.bg)
-        else:
-            render_args = (self.text, True, self.color)
-        self.image = self.font.render(*render_args)
+        render_args = (self.font, self.text, True, self.color, self.bg)
+        self.image = tools.render_text(*render_args)
         self.rect = self.image.get_rect(**self.rect_attr)
 
     def draw(self, surface):
@@ -106,14 +104,194 @@ class MultiLineLabel(object):
 class ButtonGroup(pg.sprite.Group):
     """
     A sprite group to hold multiple buttons.
+    Events are routed only to the buttons they can affect: key events to
+    the buttons bound to that key, left mouse button presses to hovered
+    buttons and releases to clicked buttons.  The key routing table is
+    rebuilt when buttons are added, removed, activated, deactivated, shown
+    or hidden; call button_changed after changing a button's bindings.
     """
+    def __init__(self, *sprites):
+        self.routes = None
+        self.hovering = set()
+        self.clicked = set()
+        self.order = {}
+        self.added = 0
+        super(ButtonGroup, self).__init__(*sprites)
+
+    def add_internal(self, sprite, *args):
+        super(ButtonGroup, self).add_internal(sprite, *args)
+        self.routes = None
+        self.order[sprite] = self.added
+        self.added += 1
+
+    def remove_internal(self, sprite):
+        super(ButtonGroup, self).remove_internal(sprite)
+        self.routes = None
+        del self.order[sprite]
+        self.hovering.discard(sprite)
+        self.clicked.discard(sprite)
+
+    def get_routes(self):
+        """
+        Return a dict of key codes to the active and visible buttons bound
+        to them, in the order they were added.
+        """
+        if self.routes is None:
+            self.routes = {}
+            for button in self.sprites():
+                if button.active and button.visible:
+                    for key in button.bindings:
+                        self.routes.setdefault(key, []).append(button)
+        return self.routes
+
     def get_event(self, event, *args, **kwargs):
         """
-        Only passes events along to Buttons that are both active and visible.
+        Only passes events along to Buttons that are both active and visible
+        and could be affected by the event.
         """
-        check = (s for s in self.sprites() if s.active and s.visible)
-        for s in check:
+        if event.type in (pg.KEYDOWN, pg.KEYUP):
+            targets = self.get_routes().get(event.key, ())
+        elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+            targets = self.in_order(self.hovering)
+        elif event.type == pg.MOUSEBUTTONUP and event.button == 1:
+            targets = self.in_order(self.clicked)
+        else:
+            return
+        for s in targets:
             s.get_event(event, *args, **kwargs)
+            if s.clicked:
+                self.clicked.add(s)
+            else:
+                self.clicked.discard(s)
+
+    def in_order(self, buttons):
+        """
+        Return the active and visible buttons among buttons in the order
+        they were added to the group.
+        """
+        buttons = [s for s in buttons if s.active and s.visible]
+        return sorted(buttons, key=self.order.get)
+
+    def button_changed(self, button):
+        """
+        Called by a Button in this group when it is activated, deactivated,
+        shown or hidden.
+        """
+        self.routes = None
+
+    def hover_changed(self, button):
+        """
+        Called by a Button in this group when its hover state changes.
+        """
+        if button.hover:
+            self.hovering.add(button)
+        else:
+            self.hovering.discard(button)
+
+
+class SpatialButtonGroup(ButtonGroup):
+    """
+    A ButtonGroup for menus with many buttons.  Buttons are indexed in a
+    uniform grid of cell_size squares and by their key bindings, so update
+    only hit tests the buttons in the cell under the mouse, the buttons
+    bound to pressed keys and those that were hovered.  If neither the
+    mouse position nor the pressed binding keys changed since the last
+    update nothing is recomputed at all.
+    Buttons that are moved (e.g. by an animation) or given new bindings
+    must be passed to reindex, or reindex called with no arguments.
+    """
+    def __init__(self, *sprites, **kwargs):
+        self.cell_size = kwargs.pop("cell_size", 128)
+        self.cells = {}
+        self.button_cells = {}
+        self.bound = {}
+        self.stale = set()
+        self.hovered = set()
+        self.mouse_pos = None
+        self.pressed = frozenset()
+        super(SpatialButtonGroup, self).__init__(*sprites, **kwargs)
+
+    def add_internal(self, sprite, *args):
+        super(SpatialButtonGroup, self).add_internal(sprite, *args)
+        # Indexed on the next update; a Button adds itself to its groups
+        # before its rect exists.
+        self.stale.add(sprite)
+
+    def remove_internal(self, sprite):
+        super(SpatialButtonGroup, self).remove_internal(sprite)
+        self.unindex(sprite)
+        self.stale.discard(sprite)
+        self.hovered.discard(sprite)
+
+    def button_changed(self, button):
+        super(SpatialButtonGroup, self).button_changed(button)
+        self.stale.add(button)
+
+    def reindex(self, *buttons):
+        """
+        Update the index for buttons (all buttons if none are given) after
+        they were moved or their bindings changed.
+        """
+        self.stale.update(buttons or self.sprites())
+        self.routes = None
+
+    def get_cells(self, rect):
+        size = self.cell_size
+        return [(x, y) for x in range(rect.left//size, (rect.right-1)//size+1)
+                       for y in range(rect.top//size, (rect.bottom-1)//size+1)]
+
+    def index(self, button):
+        self.unindex(button)
+        cells = self.get_cells(button.rect)
+        self.button_cells[button] = (cells, tuple(button.bindings))
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(button)
+        for key in button.bindings:
+            self.bound.setdefault(key, set()).add(button)
+
+    def unindex(self, button):
+        cells, bindings = self.button_cells.pop(button, ((), ()))
+        for index, keys in ((self.cells, cells), (self.bound, bindings)):
+            for key in keys:
+                index[key].discard(button)
+                if not index[key]:
+                    del index[key]
+
+    def update(self, prescaled_mouse_pos):
+        """
+        Update the hover state of the buttons that could have changed.
+        """
+        pos = tuple(prescaled_mouse_pos)
+        key_state = pg.key.get_pressed()
+        pressed = frozenset(key for key in self.bound if key_state[key])
+        if pos == self.mouse_pos and pressed == self.pressed and not self.stale:
+            return
+        for button in self.stale:
+            self.index(button)
+        size = self.cell_size
+        candidates = self.hovered | self.stale
+        candidates.update(self.cells.get((pos[0]//size, pos[1]//size), ()))
+        for key in pressed:
+            candidates.update(self.bound[key])
+        self.hovered = set()
+        for button in candidates:
+            hover = (button.rect.collidepoint(pos) or
+                     any(key in pressed for key in button.bindings))
+            button.set_hover(hover)
+            if hover:
+                self.hovered.add(button)
+        self.stale = set()
+        self.mouse_pos = pos
+        self.pressed = pressed
+
+
+def get_content_key(surface):
+    """
+    Return a key for the size and pixels of surface, so that equal images
+    share cache entries without the cache holding on to the surfaces.
+    """
+    pixels = pg.image.tostring(surface, "RGBA")
+    return surface.get_size(), hashlib.sha1(pixels).hexdigest()
 
 
 class Button(pg.sprite.Sprite, tools._KwargMixin):
@@ -137,26 +315,48 @@ class Button(pg.sprite.Sprite, tools._KwargMixin):
         self.hover = False
 
     def render_text(self):
+        """
+        Return the text of each state of the button as a (text, color) pair,
+        or None if the state has no text.  The text is rendered when the
+        state's image is made.
+        """
         font, size = self.font, self.font_size
-        if (font, size) not in LOADED_FONTS:
-            LOADED_FONTS[font, size] = pg.font.Font(font, size)
-        self.font = LOADED_FONTS[font, size]
-        text = self.text and self.font.render(self.text, 1, self.text_color)
-        hover = self.hover_text and self.font.render(self.hover_text, 1,
-                                                     self.hover_text_color)
-        disable = self.disable_text and self.font.render(self.disable_text, 1,
-                                                       self.disable_text_color)
-        return {"text" : text, "hover" : hover, "disable": disable}
+        self.font = LOADED_FONTS.get(font, size)
+        states = {"text" : (self.text, self.text_color),
+                  "hover" : (self.hover_text, self.hover_text_color),
+                  "disable" : (self.disable_text, self.disable_text_color)}
+        rendered = {}
+        for state, (text, color) in states.items():
+            rendered[state] = text and (text, tuple(tools.parse_color(color)))
+        return rendered
 
     def make_image(self, fill, image, text):
+        """
+        Return the image for one state of the button.  Buttons of the same
+        size, fill, image content and text (font, size, string and color)
+        share their images through BUTTON_IMAGES, and an image that needs
+        nothing added is used as is, so button images must not be drawn on.
+        """
         if not any((fill, image, text)):
             return None
+        if image and not (fill or text) and image.get_size() == self.rect.size:
+            return image
+        fill = fill and tuple(tools.parse_color(fill))
+        text_key = text and (LOADED_FONTS.get_key(self.font),) + text
+        key = ("button", self.rect.size, fill, image and get_content_key(image),
+               text_key)
+        return BUTTON_IMAGES.get(key, lambda: self.render_image(fill, image,
+                                                                text))
+
+    def render_image(self, fill, image, text):
         final_image = pg.Surface(self.rect.size).convert_alpha()
         final_image.fill((0,0,0,0))
         rect = final_image.get_rect()
         fill and final_image.fill(fill, rect)
         image and final_image.blit(image, rect)
-        text and final_image.blit(text, text.get_rect(center=rect.center))
+        if text:
+            text = tools.render_text(self.font, text[0], True, text[1])
+            final_image.blit(text, text.get_rect(center=rect.center))
         return final_image
 
     def get_event(self, event):
@@ -183,18 +383,56 @@ class Button(pg.sprite.Sprite, tools._KwargMixin):
                 self.click_sound and self.click_sound.play()
                 self.call and self.call(self.args or self.text)
 
+    @property
+    def active(self):
+        return self._active
+
+    @active.setter
+    def active(self, active):
+        self._active = active
+        self.notify_groups()
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        self._visible = visible
+        self.notify_groups()
+
+    def notify_groups(self):
+        """
+        Let the ButtonGroups holding this button know that it changed.
+        """
+        for group in self.groups():
+            if isinstance(group, ButtonGroup):
+                group.button_changed(self)
+
     def update(self, prescaled_mouse_pos):
         hover = self.rect.collidepoint(prescaled_mouse_pos)
         pressed = pg.key.get_pressed()
         if any(pressed[key] for key in self.bindings):
             hover = True
+        self.set_hover(hover)
+
+    def set_hover(self, hover):
+        """
+        Set the image and hover state for whether the mouse is over the
+        button (or one of its bindings is pressed).
+        """
         if not self.visible:
             self.image = Button._invisible
         elif self.active:
             self.image = (hover and self.hover_image) or self.idle_image
             if not self.hover and hover:
                 self.hover_sound and self.hover_sound.play()
-            self.hover = hover
+                self.hover_call and self.hover_call(self.args or self.text)
+            if hover != self.hover:
+                self.hover = hover
+                for group in self.groups():
+                    if isinstance(group, ButtonGroup):
+                        group.hover_changed(self)
         else:
             self.image = self.disable_image or self.idle_image
 
@@ -210,12 +448,27 @@ class FlashingText(Label):
         self.null_image.fill((0,0,0,0))
         self.rect = self.image.get_rect(**rect_attr)
         self.blink = False
+        self.changed = False
         self.timer = tools.Timer(delay)
 
     def update(self, now, *args):
-        if self.timer.check_tick(now):
+        """
+        Toggle the text on and off every delay milliseconds.
+        self.changed is True if the image changed this update.
+        """
+        self.changed = bool(self.timer.check_tick(now))
+        if self.changed:
             self.blink = not self.blink
         self.image = self.raw_image if self.blink else self.null_image
+
+    def draw_over(self, surface, background):
+        """
+        Fill the area behind the text with background and draw the current
+        image.  Returns the changed rect, for use as a dirty rect.
+        """
+        surface.fill(background, self.rect)
+        surface.blit(self.image, self.rect)
+        return self.rect
     
         
 class TextBox(tools._KwargMixin):
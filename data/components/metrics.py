@@ -0,0 +1,146 @@
+"""
+Frame time instrumentation.  FrameMetrics records how long each part of a
+frame took in a fixed size ring buffer, and MetricsOverlay draws a frame
+time graph with percentiles from it.
+"""
+
+import csv
+import timeit
+
+from array import array
+
+import pygame as pg
+
+from data.core import tools, constants
+
+
+FIELDS = ("events", "update", "draw", "render", "display", "work", "frame")
+
+
+class FrameMetrics(object):
+    """
+    Records per frame timings in milliseconds into fixed size ring buffers,
+    one array per field, along with the name of the state active that frame.
+    A frame is timed by calling start_frame, then lap after each part of the
+    frame with the name of that part, and finally end_frame.  The work field
+    is the sum of the laps and frame is the full time between frames
+    including any time spent waiting on the clock.
+    """
+    def __init__(self, size=600):
+        self.size = size
+        self.timings = {field: array("d", [0.0]) * size for field in FIELDS}
+        self.states = [None] * size
+        self.count = 0
+        self.laps = {}
+        self.frame_start = None
+        self.mark = None
+
+    def start_frame(self):
+        """
+        Begin timing a new frame.
+        """
+        self.laps = {}
+        self.frame_start = self.mark = timeit.default_timer()
+
+    def lap(self, field):
+        """
+        Record the time since the last lap (or the frame start) as field.
+        """
+        now = timeit.default_timer()
+        self.laps[field] = self.laps.get(field, 0.0) + (now-self.mark)*1000.0
+        self.mark = now
+
+    def end_frame(self, state_name, frame_time):
+        """
+        Store the laps of the current frame in the ring buffer.
+        """
+        index = self.count % self.size
+        for field in FIELDS[:-2]:
+            self.timings[field][index] = self.laps.get(field, 0.0)
+        self.timings["work"][index] = (self.mark-self.frame_start) * 1000.0
+        self.timings["frame"][index] = frame_time
+        self.states[index] = state_name
+        self.count += 1
+
+    def get_ordered(self, values):
+        """
+        Return the recorded items of a ring buffer oldest first.
+        """
+        if self.count < self.size:
+            return list(values[:self.count])
+        index = self.count % self.size
+        return list(values[index:]) + list(values[:index])
+
+    def get_recent(self, field="work"):
+        """
+        Return the recorded timings of field oldest first.
+        """
+        return self.get_ordered(self.timings[field])
+
+    def percentiles(self, field="work", points=(50, 95, 99)):
+        """
+        Return the given percentiles of the recorded timings of field.
+        """
+        values = sorted(self.get_recent(field))
+        if not values:
+            return [0.0 for point in points]
+        last = len(values) - 1
+        return [values[int(round(point/100.0*last))] for point in points]
+
+    def write_csv(self, path):
+        """
+        Write the contents of the ring buffer to a CSV file, oldest first.
+        """
+        first = max(0, self.count-self.size)
+        columns = [self.get_recent(field) for field in FIELDS]
+        states = self.get_ordered(self.states)
+        with open(path, "w") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(("frame_number", "state") + FIELDS)
+            for i, state in enumerate(states):
+                times = ["{:.3f}".format(column[i]) for column in columns]
+                writer.writerow([first+i, state] + times)
+
+
+class MetricsOverlay(object):
+    """
+    Draws a graph of recent frame work times with the 50th, 95th and 99th
+    percentiles.  Bars over the frame budget are drawn in red.
+    """
+    def __init__(self, metrics, budget=1000/60.0, size=(300, 120)):
+        self.metrics = metrics
+        self.budget = budget
+        self.image = pg.Surface(size).convert()
+        self.rect = self.image.get_rect()
+        self.graph_rect = pg.Rect(0, 24, size[0], size[1]-24)
+        self.font = tools.load_font(constants.FONTS["Fixedsys500c"], 16)
+        self.text = None
+        self.text_image = None
+
+    def draw(self, surface):
+        """
+        Draw the overlay to the topleft of surface and return its rect.
+        """
+        self.image.fill(pg.Color("gray10"))
+        graph = self.graph_rect
+        ceiling = self.budget * 2
+        recent = self.metrics.get_recent("work")[-graph.w:]
+        start = graph.right - len(recent)
+        for x, value in enumerate(recent, start):
+            height = int(min(value, ceiling) / ceiling * graph.h)
+            color = "red" if value > self.budget else "green"
+            self.image.fill(pg.Color(color),
+                            (x, graph.bottom-height, 1, height))
+        budget_y = graph.bottom - graph.h//2
+        pg.draw.line(self.image, pg.Color("yellow"),
+                     (graph.x, budget_y), (graph.right, budget_y))
+        text = "p50 {:.1f}  p95 {:.1f}  p99 {:.1f} ms"
+        text = text.format(*self.metrics.percentiles())
+        if text != self.text:
+            # Rendered directly; these strings are rarely shown again and
+            # would only push useful text out of tools.TEXT_CACHE.
+            self.text = text
+            self.text_image = self.font.render(text, True, pg.Color("white"))
+        self.image.blit(self.text_image, (4, 4))
+        surface.blit(self.image, self.rect)
+        return self.rect
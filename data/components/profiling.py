@@ -0,0 +1,150 @@
+"""
+Profilers that the StateMachine runs around the lifetime of each state,
+writing one pstats file per state name.  The files can be inspected with
+the pstats module, e.g. python -m pstats profiles/lobby.pstats.
+"""
+
+import os
+import sys
+import time
+import marshal
+import cProfile
+import threading
+
+from collections import Counter
+
+
+class StateProfiler(object):
+    """
+    Deterministic profiler using cProfile.  Each state name gets its own
+    profile which accumulates over every visit to that state; the stats
+    file for the state is rewritten each time the state is left.
+    """
+    def __init__(self, directory="profiles"):
+        self.directory = directory
+        self.profiles = {}
+        self.name = None
+
+    def get_path(self, name):
+        """
+        Return the path of the stats file for the state name.
+        """
+        return os.path.join(self.directory, "{}.pstats".format(name))
+
+    def start(self, name):
+        """
+        Stop profiling the current state (if any) and start profiling name.
+        """
+        self.stop()
+        self.name = name
+        self.profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def stop(self):
+        """
+        Stop profiling the current state and write its stats file.
+        """
+        if self.name is None:
+            return
+        profile = self.profiles[self.name]
+        profile.disable()
+        self.write(profile, self.get_path(self.name))
+        self.name = None
+
+    def write(self, profile, path):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        profile.dump_stats(path)
+
+
+class SamplingStateProfiler(StateProfiler):
+    """
+    Statistical profiler that samples the stack of the thread it was
+    created on every interval milliseconds from a background thread.
+    Much lower overhead than StateProfiler, at the cost of precision.  Each
+    sample is credited with the time measured since the previous one, which
+    is usually longer than interval since the sampler must wait for the GIL.
+    """
+    def __init__(self, interval, directory="profiles"):
+        super(SamplingStateProfiler, self).__init__(directory)
+        self.interval = interval / 1000.0
+        self.thread_id = threading.current_thread().ident
+        self.sampler = None
+        self.sampling = False
+
+    def start(self, name):
+        self.stop()
+        self.name = name
+        samples = self.profiles.setdefault(name, _Samples())
+        self.sampling = True
+        self.sampler = threading.Thread(target=self.sample, args=(samples,))
+        self.sampler.daemon = True
+        self.sampler.start()
+
+    def stop(self):
+        if self.name is None:
+            return
+        self.sampling = False
+        self.sampler.join()
+        self.write(self.profiles[self.name], self.get_path(self.name))
+        self.name = None
+
+    def sample(self, samples):
+        """
+        Run on the sampler thread until stop is called.
+        """
+        last = time.perf_counter()
+        while self.sampling:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                samples.add(frame, now - last)
+            last = now
+
+
+class _Samples(object):
+    """
+    Stack samples for one state, kept as counts and times that convert
+    directly into the format used by the pstats module.
+    """
+    def __init__(self):
+        self.counts = Counter()
+        self.caller_counts = Counter()
+        self.own = Counter()
+        self.total = Counter()
+        self.callers = Counter()
+
+    def add(self, frame, elapsed):
+        """
+        Add one sample of the stack ending at frame, standing for elapsed
+        seconds.
+        """
+        seen = set()
+        callee = None
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            if callee is None:
+                self.own[key] += elapsed
+            else:
+                self.caller_counts[callee, key] += 1
+                self.callers[callee, key] += elapsed
+            if key not in seen:
+                seen.add(key)
+                self.counts[key] += 1
+                self.total[key] += elapsed
+            callee = key
+            frame = frame.f_back
+
+    def dump_stats(self, path):
+        """
+        Write the samples as a pstats compatible stats file.
+        """
+        stats = {}
+        for key, count in self.counts.items():
+            stats[key] = (count, count, self.own[key], self.total[key], {})
+        for (callee, caller), count in self.caller_counts.items():
+            elapsed = self.callers[callee, caller]
+            stats[callee][4][caller] = (count, count, 0.0, elapsed)
+        with open(path, "wb") as stats_file:
+            marshal.dump(stats, stats_file)
@@ -0,0 +1,120 @@
+"""
+An index for finding items by typed, possibly partial, text such as the
+names of the games in the lobby.
+"""
+
+import re
+
+
+WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    """
+    Lower case text and reduce it to its words separated by single spaces.
+    """
+    return " ".join(WORD.findall(text.replace("_", " ").lower()))
+
+
+def get_trigrams(text):
+    """
+    Return the set of three character substrings of text.
+    """
+    return set(text[i:i+3] for i in range(len(text)-2))
+
+
+class SearchIndex(object):
+    """
+    Finds the keys whose text contains every word of a query.  Query words
+    shorter than three characters must be the start of a word of the text;
+    longer words may appear anywhere in it.  Short words are looked up in
+    an index of word prefixes and longer words in an index of trigrams,
+    with the candidates then checked against the text.
+    search is meant to be called on every keystroke: a query that extends
+    the previous one only rechecks the previous results.
+    """
+    def __init__(self):
+        self.keys = []
+        self.texts = {}
+        self.order = {}
+        self.prefixes = {}
+        self.trigrams = {}
+        self.last_query = None
+        self.last_results = None
+
+    def add(self, key, *texts):
+        """
+        Index key under texts (e.g. its name and any descriptive metadata).
+        """
+        text = normalize(" ".join(texts))
+        self.order[key] = len(self.keys)
+        self.keys.append(key)
+        self.texts[key] = text
+        for word in text.split():
+            for i in range(1, len(word)+1):
+                self.prefixes.setdefault(word[:i], set()).add(key)
+        for trigram in get_trigrams(text):
+            self.trigrams.setdefault(trigram, set()).add(key)
+        self.last_query = None
+
+    def matches(self, key, words):
+        """
+        Check that the text of key matches every word.
+        """
+        text = self.texts[key]
+        for word in words:
+            if len(word) < 3:
+                if not (text.startswith(word) or " "+word in text):
+                    return False
+            elif word not in text:
+                return False
+        return True
+
+    def get_candidates(self, words):
+        """
+        Return the keys that may match all of words, using the indexes.
+        """
+        candidates = None
+        for word in words:
+            if len(word) < 3:
+                found = self.prefixes.get(word, set())
+            else:
+                sets = [self.trigrams.get(t, set()) for t in get_trigrams(word)]
+                found = set.intersection(*sets)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                break
+        return candidates
+
+    def extends_last(self, query):
+        """
+        Check that every key matching query also matched the last query.
+        That is not so if the last word grew from a prefix to a substring.
+        """
+        if not self.last_query or not query.startswith(self.last_query):
+            return False
+        last_word = self.last_query.split()[-1]
+        word = query.split()[len(self.last_query.split())-1]
+        return len(last_word) >= 3 or len(word) < 3
+
+    def search(self, query):
+        """
+        Return the keys matching query in the order they were added, or all
+        keys if the query is empty.
+        """
+        query = normalize(query)
+        if not query:
+            results = list(self.keys)
+        elif self.extends_last(query):
+            words = query.split()
+            results = [key for key in self.last_results
+                       if self.matches(key, words)]
+        else:
+            words = query.split()
+            candidates = self.get_candidates(words)
+            results = sorted((key for key in candidates
+                              if self.matches(key, words)),
+                             key=self.order.get)
+        self.last_query = query
+        self.last_results = results
+        return results
@@ -1,13 +1,17 @@
 import os
 import pygame as pg
 
+from collections import OrderedDict
+
 from data.core import constants
 from data.components.labels import Button, Label
+from data.components.labels.labels import BUTTON_IMAGES
 
 
 class NeonButton(Button):
     """
     Neon sign style button that glows on mouseover.
+    The images of buttons with the same text and font size are shared.
     """
     width = 182
     height = 58
@@ -15,15 +19,9 @@ class NeonButton(Button):
     def __init__(self, pos, text, font_size=32,
                  call=None, args=None, *groups, **kwargs):
         text = text.replace("_", " ")
-        blank = constants.GFX["neon_button_blank"].copy()
-        on_label = Label(constants.FONTS["Fixedsys500c"], font_size, text,
-                         constants.HIGH_LIGHT_GREEN, {"center": (91, 29)})
-        off_label = Label(constants.FONTS["Fixedsys500c"], font_size, text,
-                          constants.LOW_LIGHT_GREEN, {"center": (91, 29)})
-        on_image = blank.subsurface((self.width, 0, self.width, self.height))
-        off_image = blank.subsurface((0, 0, self.width, self.height))
-        on_label.draw(on_image)
-        off_label.draw(off_image)
+        sheet = self.get_sheet(text, font_size)
+        on_image = sheet.subsurface((self.width, 0, self.width, self.height))
+        off_image = sheet.subsurface((0, 0, self.width, self.height))
         rect = on_image.get_rect(topleft=pos)
         settings = {"hover_image" : on_image,
                     "idle_image"  : off_image,
@@ -32,16 +30,64 @@ class NeonButton(Button):
         settings.update(kwargs)
         super(NeonButton, self).__init__(rect, *groups, **settings)
 
+    @classmethod
+    def get_sheet(cls, text, font_size):
+        """
+        Return the shared image holding the idle and hover images side by
+        side for a button's text and font size.
+        """
+        return cls.prepare([(text, font_size)])[0]
+
+    @classmethod
+    def prepare(cls, buttons):
+        """
+        Render the images of a menu of buttons, given as (text, font_size)
+        pairs, in one pass onto a single surface and add them to the shared
+        image cache.  Buttons already cached are not rendered again.
+        Returns the sheet of each button in order.
+        """
+        buttons = [(text.replace("_", " "), font_size)
+                   for text, font_size in buttons]
+        missing = [button for button in OrderedDict.fromkeys(buttons)
+                   if ("neon",) + button not in BUTTON_IMAGES]
+        rendered = {}
+        if missing:
+            blank = constants.GFX["neon_button_blank"]
+            width, height = blank.get_size()
+            menu = pg.Surface((width, height*len(missing))).convert_alpha()
+            menu.fill((0,0,0,0))
+            for i, (text, font_size) in enumerate(missing):
+                sheet = menu.subsurface((0, height*i, width, height))
+                sheet.blit(blank, (0, 0))
+                for x, color in ((0, constants.LOW_LIGHT_GREEN),
+                                 (cls.width, constants.HIGH_LIGHT_GREEN)):
+                    Label(constants.FONTS["Fixedsys500c"], font_size, text,
+                          color, {"center": (x+91, 29)}).draw(sheet)
+                rendered[(text, font_size)] = sheet
+        sheets = []
+        for button in buttons:
+            # A cached sheet may have been evicted to make room for the rest.
+            make = lambda button=button: (rendered[button] if button in rendered
+                                          else cls.prepare([button])[0])
+            sheets.append(BUTTON_IMAGES.get(("neon",) + button, make))
+        return sheets
+
 
 class GameButton(Button):
+    """
+    A lobby button showing a game's thumbnail and name.  The composed
+    images are kept for each game in GameButton.images and reused until the
+    thumbnail file (thumb_path, if given) is modified.
+    """
     ss_size = (160, 120)
     width = ss_size[0] + 12
     height = ss_size[1] + 12
     font = constants.FONTS["Fixedsys500c"]
+    images = {}
 
     def __init__(self, pos, game, thumb, call, *groups, **kwargs):
-        path = os.path.join(".", "data", "states", game)
-        idle, highlight = self.make_images(game, thumb)
+        thumb_path = kwargs.pop("thumb_path", None)
+        idle, highlight = self.get_images(game, thumb, thumb_path)
         rect = idle.get_rect(topleft=pos)
         settings = {"hover_image" : highlight,
                     "idle_image"  : idle,
@@ -50,12 +96,51 @@ class GameButton(Button):
         settings.update(kwargs)
         super(GameButton, self).__init__(rect, *groups, **settings)
 
+    def assign(self, pos, game, thumb, thumb_path=None):
+        """
+        Reuse this button for another game, moving it to pos.
+        """
+        self.idle_image, self.hover_image = self.get_images(game, thumb,
+                                                            thumb_path)
+        self.disable_image = None
+        self.image = self.idle_image
+        self.rect = self.idle_image.get_rect(topleft=pos)
+        self.args = game
+        self.clicked = False
+        self.hover = False
+
+    @classmethod
+    def get_version(cls, thumb_path):
+        """
+        Return a value that changes whenever the thumbnail file does.
+        """
+        try:
+            return (thumb_path, os.path.getmtime(thumb_path))
+        except (TypeError, OSError):
+            return (thumb_path, None)
+
+    def get_images(self, game, thumb, thumb_path=None):
+        """
+        Return the idle and highlight images for game, composing them only
+        if they are not cached or the thumbnail file has changed since.
+        """
+        version = self.get_version(thumb_path)
+        cached = GameButton.images.get(game)
+        if cached and cached[0] == version:
+            return cached[1:]
+        if cached and thumb_path:
+            # The file changed since thumb was loaded.
+            thumb = pg.image.load(thumb_path).convert()
+        idle, highlight = self.make_images(game, thumb)
+        GameButton.images[game] = (version, idle, highlight)
+        return idle, highlight
+
     def make_images(self, game, icon):
         icon = pg.transform.scale(icon, self.ss_size).convert_alpha()
         icon_rect = icon.get_rect()
         label_text = game.replace("_", " ").capitalize()
-        label = Label(self.font, 28, label_text, constants.LOW_LIGHT_GREEN,
-                      {"center": (0, 0)})
+        label = Label(GameButton.font, 28, label_text,
+                      constants.LOW_LIGHT_GREEN, {"center": (0, 0)})
         rect = pg.Rect(0, 0, self.width, self.height+label.rect.h)
         icon_rect.midtop = (rect.centerx, 10)
         label.rect.midtop = icon_rect.midbottom
@@ -3,8 +3,15 @@ A generalized state machine.  Most notably used for general program flow.
 """
 
 import gc
+import threading
+
+from collections import OrderedDict
+
 import pygame as pg
 
+from data.core import tools
+from data.components.animation import Scheduler
+
 
 class StateMachine(object):
     """
@@ -13,17 +20,32 @@ class StateMachine(object):
     (only instantiated on startup), or instances of these states.  Instances
     should be used if you will be switching back to this state after leaving it
     and need it to remain the way it was when you left it. 
+    If a profiler (see data.components.profiling) is assigned to the profiler
+    attribute, each state is profiled from its creation until it is left.
+    When holding classes, preload can be used to construct the state that is
+    likely to be started next on a worker thread ahead of time, and up to
+    pool_size instances of states that set poolable are kept when they are
+    left and started again instead of being constructed anew.  The least
+    recently used are released and dropped once the pool is full.
     """
-    def __init__(self, hold_instances=False):
+    def __init__(self, hold_instances=False, pool_size=0):
         """
         Pass hold_instances=True to let the machine know that the state_dict
         contains instances rather than classes.
         """
         self.hold_instances = hold_instances
+        self.pool_size = pool_size
+        self.pool = OrderedDict()
         self.done = False
         self.state_dict = {}
         self.state_name = None
         self.state = None
+        self.now = None
+        self.profiler = None
+        self.preload_lock = threading.Lock()
+        self.preloading = {}
+        self.preloaded = {}
+        self.preload_latest = None
 
     # Possibly remove or absorb into __init__.
     def setup_states(self, state_dict):
@@ -37,11 +59,29 @@ class StateMachine(object):
         Checks if a state is done or has called for a game quit.
         State is flipped if neccessary and State.update is called.
         """
+        self.now = now
         if self.state.quit:
             self.done = True
         elif self.state.done:
             self.flip_state()
         self.state.update(surface, keys, now, dt, scale)
+        self.state.scheduler.update(dt)
+
+    def draw(self, surface, alpha=1.0):
+        """
+        Draw the current State with the interpolation alpha (the fraction of
+        a fixed timestep elapsed since its last update).  Only States that
+        set interpolate are drawn here; others draw during update.
+        """
+        if self.state.interpolate:
+            self.state.draw(surface, alpha)
+
+    def get_dirty_rects(self):
+        """
+        Return the rects of the surface the current State changed this frame,
+        or None if the whole surface should be redrawn.
+        """
+        return self.state.get_dirty_rects()
 
     def start_state(self, state_name, persist=None):
         """
@@ -55,11 +95,94 @@ class StateMachine(object):
         except KeyError:
             print('Cannot find state: {}'.format(state_name))
             raise RuntimeError
-        instance = state if self.hold_instances else state(self)
+        if self.profiler:
+            self.profiler.start(state_name)
+        instance = self.pool.pop(state_name, None)
+        if instance is None:
+            instance = self.take_preloaded(state_name)
+        self.drop_preloaded()
+        if instance is None:
+            instance = state if self.hold_instances else state(self)
         instance.startup(persist)
+        if self.now is not None:
+            # Keep start times on the same clock as the now passed to update;
+            # this matters when a headless Control is simulating time.
+            instance.start_time = self.now
         self.state = instance
         self.state_name = state_name
 
+    def preload(self, state_name):
+        """
+        Start constructing an instance of state_name on a worker thread so
+        that starting it later is just a swap.  Only the most recently
+        requested state is kept, and only until the next state is started;
+        any other preloaded instance is cleaned up and discarded.  Does
+        nothing when holding instances or if the state is already loaded.
+        """
+        if self.hold_instances or state_name not in self.state_dict:
+            return
+        if state_name in self.pool:
+            return
+        with self.preload_lock:
+            if state_name in self.preloading:
+                # Keep it when it finishes, even if another was requested.
+                self.preload_latest = state_name
+                return
+            if state_name in self.preloaded:
+                return
+            discarded = list(self.preloaded.values())
+            self.preloaded.clear()
+            self.preload_latest = state_name
+            worker = threading.Thread(target=self._preload, args=(state_name,))
+            worker.daemon = True
+            self.preloading[state_name] = worker
+        for instance in discarded:
+            instance.cleanup()
+        worker.start()
+
+    def _preload(self, state_name):
+        """
+        Construct a state instance; run on a preload worker thread.
+        """
+        try:
+            instance = self.state_dict[state_name](self)
+        except Exception:
+            # Leave it to start_state to construct the state again and
+            # report the error on the main thread.
+            instance = None
+        with self.preload_lock:
+            del self.preloading[state_name]
+            if instance is not None and state_name == self.preload_latest:
+                self.preloaded[state_name] = instance
+                instance = None
+        if instance is not None:
+            # A different state was requested while this one was loading.
+            instance.cleanup()
+
+    def take_preloaded(self, state_name):
+        """
+        Return the preloaded instance of state_name, waiting for it if it is
+        still being constructed, or None if it was never preloaded.
+        """
+        with self.preload_lock:
+            worker = self.preloading.get(state_name)
+        if worker:
+            worker.join()
+        with self.preload_lock:
+            return self.preloaded.pop(state_name, None)
+
+    def drop_preloaded(self):
+        """
+        Clean up and discard any preloaded instance that was not started,
+        including one still being constructed.
+        """
+        with self.preload_lock:
+            discarded = list(self.preloaded.values())
+            self.preloaded.clear()
+            self.preload_latest = None
+        for instance in discarded:
+            instance.cleanup()
+
     def flip_state(self):
         """
         When a State changes to done necessary startup and cleanup functions
@@ -67,9 +190,41 @@ class StateMachine(object):
         """
         previous, self.state_name = self.state_name, self.state.next
         persist = self.state.cleanup()
+        self.state.scheduler.clear()
+        if self.profiler:
+            self.profiler.stop()
+        kept = self.pool_state(previous, self.state)
         self.start_state(self.state_name, persist)
         self.state.previous = previous
-        gc.collect()
+        evicted = self.evict()
+        if evicted or not kept:
+            # Only worth a full collection when a state instance was let go.
+            gc.collect()
+
+    def pool_state(self, state_name, instance):
+        """
+        Keep a state instance that was just left for reuse if pooling is
+        enabled and the state allows it.  Returns whether it was kept.
+        """
+        if self.hold_instances or not self.pool_size:
+            return False
+        if not getattr(instance, "poolable", False):
+            return False
+        self.pool[state_name] = instance
+        return True
+
+    def evict(self):
+        """
+        Release and drop the least recently used pooled states until the
+        pool is within pool_size.  Returns whether any were dropped.
+        Pooled states were already cleaned up when they were left.
+        """
+        evicted = False
+        while len(self.pool) > self.pool_size:
+            _, instance = self.pool.popitem(last=False)
+            instance.release()
+            evicted = True
+        return evicted
 
     def get_event(self, event, scale=(1,1)):
         """
@@ -78,12 +233,45 @@ class StateMachine(object):
         self.state.get_event(event, scale)
 
 
+class LazyState(object):
+    """
+    Stands in for a state class in a state_dict until the state is first
+    started.  Calling it calls loader to get the real state class (e.g. by
+    importing its module) and then instantiates that class.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.state = None
+
+    def load(self):
+        """
+        Return the real state class, loading it if this is the first call.
+        """
+        if self.state is None:
+            self.state = self.loader()
+        return self.state
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
 class _State(object):
     """
     This is a prototype class for States.  All states should inherit from it.
     No direct instances of this class should be created. get_event and update
     must be overloaded in the childclass.  The startup and cleanup methods
     need to be overloaded when there is data that must persist between States.
+    States that set interpolate to True are updated with a fixed timestep and
+    must not draw in update; draw is instead called once per rendered frame
+    with an interpolation alpha.
+    States that only change small parts of the screen may overload
+    get_dirty_rects so that only those parts are scaled and updated.
+    States that can be started again after being left (startup must then
+    reset whatever it needs to) may set poolable to True to let their
+    StateMachine keep the instance instead of constructing a new one; release
+    is called when a kept instance is finally dropped.
+    Tasks added to a State's scheduler are run by its StateMachine after
+    each update and dropped when the State is cleaned up.
     """
     def __init__(self, controller, persistant={}):
         self.controller = controller
@@ -94,6 +282,9 @@ class _State(object):
         self.next = None
         self.previous = None
         self.persist = persistant
+        self.interpolate = False
+        self.poolable = False
+        self.scheduler = Scheduler()
 
     def get_event(self, event, scale=(1,1)):
         """
@@ -118,15 +309,33 @@ class _State(object):
         self.done = False
         return self.persist
 
+    def release(self):
+        """
+        Free what a poolable State keeps between visits (cleanup has already
+        been called).  Called once when its StateMachine drops the instance.
+        """
+        pass
+
     def update(self, surface, keys, now, dt, scale):
         """
         Update function for state.  Must be overloaded in children.
         """
-        self.draw(surface)
+        if not self.interpolate:
+            self.draw(surface)
+
+    def get_dirty_rects(self):
+        """
+        Return a list of rects of the surface that were changed by this
+        frame's update and draw, or None if the whole surface must be redrawn.
+        Always returning None is safe; this is the default.
+        """
+        return None
 
-    def draw(self, surface):
+    def draw(self, surface, alpha=1.0):
         """
-        Put all drawing logic here.  Called at the end of the update method.
+        Put all drawing logic here.  Called at the end of the update method,
+        or once per frame by the StateMachine if interpolate is set; alpha is
+        the fraction of a timestep to interpolate positions by.
         """
         pass
 
@@ -134,7 +343,43 @@ class _State(object):
     def render_font(self, font, msg, color, center):
         """
         Return the rendered font surface and its rect centered on center.
+        The surface is shared through the text cache and must not be modified.
         """
-        msg = font.render(msg, 1, color)
+        msg = tools.render_text(font, msg, True, color)
         rect = msg.get_rect(center=center)
         return msg, rect
+
+
+class _FlashingTextState(_State):
+    """
+    A prototype for still States whose only movement is a FlashingText.
+    The whole screen is drawn on the first frame after startup; after that
+    only flashing_text is redrawn, over background, and only when it blinks.
+    Children set flashing_text and background and overload draw.
+    """
+    def __init__(self, controller):
+        super(_FlashingTextState, self).__init__(controller)
+        self.flashing_text = None
+        self.background = None
+        self.redraw = True
+        self.dirty_rects = None
+
+    def startup(self, persistant):
+        super(_FlashingTextState, self).startup(persistant)
+        self.redraw = True
+        self.dirty_rects = None
+
+    def update(self, surface, keys, now, dt, scale):
+        self.flashing_text.update(now)
+        if self.redraw:
+            self.draw(surface)
+            self.redraw = False
+            self.dirty_rects = None
+        elif self.flashing_text.changed:
+            rect = self.flashing_text.draw_over(surface, self.background)
+            self.dirty_rects = [rect]
+        else:
+            self.dirty_rects = []
+
+    def get_dirty_rects(self):
+        return self.dirty_rects
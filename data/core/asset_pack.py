@@ -0,0 +1,133 @@
+"""
+Pre-baked asset packs.  An asset pack holds the already decoded pixels of
+many images in a single file so that startup doesn't need to decode them.
+The pack is memory-mapped and images with alpha are built directly on the
+mapped pixels, so their memory is shared with the page cache (and with any
+other process using the same pack).  Build a pack with --build_pack.
+
+File layout: an 8 byte magic string, the length of the index as an 8 byte
+little-endian integer, the JSON index and then the pixel data of each image,
+each starting on an ALIGN byte boundary.
+"""
+
+import os
+import json
+import mmap
+import struct
+
+import pygame as pg
+
+
+MAGIC = b"ARCPACK1"
+ALIGN = 64
+GFX_TYPES = (".png", ".jpg", ".bmp")
+
+
+def build_pack(path, directories, accept=GFX_TYPES):
+    """
+    Write a pack containing every image found under directories (searched
+    recursively).  Images with alpha are stored as BGRA, which matches the
+    format convert_alpha() produces on little-endian machines; others are
+    stored as RGB and converted when loaded.  Returns the number of images.
+    """
+    index = {}
+    blobs = []
+    offset = 0
+    for directory in directories:
+        for folder, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower() not in accept:
+                    continue
+                source = os.path.join(folder, filename)
+                img = pg.image.load(source)
+                image_format = "BGRA" if img.get_alpha() else "RGB"
+                data = pg.image.tostring(img, image_format)
+                index[os.path.normpath(source)] = {
+                    "offset": offset,
+                    "length": len(data),
+                    "size": img.get_size(),
+                    "format": image_format,
+                    "mtime": os.path.getmtime(source)}
+                blobs.append(data)
+                offset += len(data) + _padding(len(data))
+    header = json.dumps(index).encode("utf-8")
+    start = len(MAGIC) + 8 + len(header)
+    start += _padding(start)
+    with open(path, "wb") as pack_file:
+        pack_file.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        pack_file.write(b"\0" * (start-pack_file.tell()))
+        for data in blobs:
+            pack_file.write(data + b"\0" * _padding(len(data)))
+    return len(blobs)
+
+
+def _padding(length):
+    return -length % ALIGN
+
+
+def open_pack(path):
+    """
+    Return the AssetPack at path, or None if there is no valid pack there.
+    """
+    try:
+        return AssetPack(path)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class AssetPack(object):
+    """
+    A memory-mapped asset pack.  Images are only taken from the pack while
+    their source file is unchanged (or absent); otherwise the load methods
+    return None so the caller can fall back to decoding the source.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as pack_file:
+            self.map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not an asset pack".format(path))
+        start = len(MAGIC) + 8
+        length = struct.unpack("<Q", self.map[len(MAGIC):start])[0]
+        self.index = json.loads(self.map[start:start+length].decode("utf-8"))
+        self.data_start = start + length + _padding(start+length)
+        self.view = memoryview(self.map)
+
+    def is_current(self, path):
+        """
+        Check that path is packed and its source hasn't changed since.
+        """
+        entry = self.index.get(os.path.normpath(path))
+        if entry is None:
+            return False
+        return not os.path.exists(path) or os.path.getmtime(path) == entry["mtime"]
+
+    def load_image(self, path, colorkey=(255,0,255)):
+        """
+        Return the image packed from path, converted as load_all_gfx would,
+        or None if it isn't packed or is out of date.
+        """
+        if not self.is_current(path):
+            return None
+        entry = self.index[os.path.normpath(path)]
+        start = self.data_start + entry["offset"]
+        data = self.view[start:start+entry["length"]]
+        img = pg.image.frombuffer(data, tuple(entry["size"]), entry["format"])
+        if entry["format"] == "RGB":
+            img = img.convert()
+            img.set_colorkey(colorkey)
+        return img
+
+    def load_gfx(self, directory, colorkey=(255,0,255), accept=GFX_TYPES):
+        """
+        Packed equivalent of load_all_gfx.  Returns None unless every image
+        in directory is packed and current.
+        """
+        paths = {}
+        for pic in os.listdir(directory):
+            name, ext = os.path.splitext(pic)
+            if ext.lower() in accept:
+                paths[name] = os.path.join(directory, pic)
+        if not all(self.is_current(path) for path in paths.values()):
+            return None
+        return {name: self.load_image(path, colorkey)
+                for name, path in paths.items()}
@@ -0,0 +1,124 @@
+"""
+Benchmarks for performance sensitive parts of the program.
+Run one with the --benchmark argument, e.g. --benchmark scaling.
+"""
+
+import timeit
+
+import pygame as pg
+
+from data.core import constants, tools
+
+
+def time_per_call(function, number):
+    """
+    Return the average time in milliseconds of calling function number times.
+    """
+    return timeit.timeit(function, number=number) * 1000.0 / number
+
+
+def scaling(frames=100):
+    """
+    Print the average per frame cost of scaling the render surface to each
+    of the supported resolutions with each scaling mode.
+    """
+    source = pg.Surface(constants.RENDER_SIZE).convert()
+    source.fill(constants.BACKGROUND_BASE)
+    splash = constants.GFX["splash2"]
+    source.blit(splash, splash.get_rect(center=source.get_rect().center))
+    print("{:>12}".format("ms/frame") +
+          "".join("{:>10}".format(mode) for mode in tools.SCALE_MODES))
+    for resolution in constants.RESOLUTIONS:
+        screen = pg.Surface(resolution).convert()
+        row = ["{:>12}".format("{}x{}".format(*resolution))]
+        for mode in tools.SCALE_MODES:
+            view_rect = tools.get_view_rect(constants.RENDER_SIZE,
+                                            resolution, mode)
+            view = screen.subsurface(view_rect)
+            scale = lambda: tools.scale_surface(source, view, mode)
+            row.append("{:>10.3f}".format(time_per_call(scale, frames)))
+        print("".join(row))
+
+
+def animation(tweens=2000, frames=50):
+    """
+    Print the average per frame cost of moving tweens rects with one
+    Animation each and with a single AnimationEngine.
+    """
+    from data.components.animation import Animation, AnimationEngine
+    rects = [pg.Rect(0, 0, 10, 10) for _ in range(tweens)]
+    group = pg.sprite.Group()
+    for rect in rects:
+        ani = Animation(x=928, y=696, duration=frames*20.0,
+                        transition="in_out_quint", round_values=True)
+        ani.start(rect)
+        group.add(ani)
+    cost = time_per_call(lambda: group.update(16.0), frames)
+    print("{:>16} {:8.3f} ms/frame".format("Animation", cost))
+    engine = AnimationEngine()
+    for rect in rects:
+        engine.animate(rect, x=0, y=0, duration=frames*20.0,
+                       transition="in_out_quint", round_values=True)
+    cost = time_per_call(lambda: engine.update(16.0), frames)
+    print("{:>16} {:8.3f} ms/frame".format("AnimationEngine", cost))
+
+
+def easing(calls=20000, error_samples=100003):
+    """
+    Print the average cost of evaluating each transition exactly and from
+    its lookup table, and the largest error of the table.
+    """
+    from data.components import animation
+    progress = [i / float(calls) for i in range(calls)]
+    points = [i / float(error_samples-1) for i in range(error_samples)]
+    print("{:>16}{:>12}{:>12}{:>12}".format("us/call", "exact", "table",
+                                            "max error"))
+    for name in animation.TRANSITION_NAMES:
+        exact = animation.get_transition(name)
+        table = animation.get_transition(name, table=True)
+        costs = []
+        for function in (exact, table):
+            values = iter(progress)
+            cost = time_per_call(lambda: function(next(values)), calls)
+            costs.append(cost * 1000.0)
+        error = max(abs(exact(p)-table(p)) for p in points)
+        print("{:>16}{:12.3f}{:12.3f}{:12.2e}".format(name, costs[0],
+                                                      costs[1], error))
+
+
+def buttons(count=500, frames=200):
+    """
+    Print the average per frame cost of updating a grid of count buttons
+    in a ButtonGroup and in a SpatialButtonGroup, with the mouse moving
+    every frame and with it still.
+    """
+    from data.components.labels import Button, ButtonGroup, SpatialButtonGroup
+    columns = int(count ** 0.5)
+    size = (constants.RENDER_SIZE[0]//columns, constants.RENDER_SIZE[1]//columns)
+    print("{:>20}{:>10}{:>10}".format("ms/frame", "moving", "still"))
+    for group_class in (ButtonGroup, SpatialButtonGroup):
+        group = group_class()
+        for i in range(count):
+            y, x = divmod(i, columns)
+            Button(((x*size[0], y*size[1]), size), group,
+                   fill_color=pg.Color("gray"))
+        positions = iter([(i % constants.RENDER_SIZE[0], i % 500)
+                          for i in range(frames)])
+        moving = time_per_call(lambda: group.update(next(positions)), frames)
+        still = time_per_call(lambda: group.update((10, 10)), frames)
+        print("{:>20}{:10.3f}{:10.3f}".format(group_class.__name__, moving,
+                                              still))
+
+
+BENCHMARKS = {"scaling" : scaling,
+              "animation" : animation,
+              "easing" : easing,
+              "buttons" : buttons}
+
+
+def run(name):
+    """
+    Run the benchmark registered under name.
+    """
+    constants.LOADER.wait()
+    BENCHMARKS[name]()
@@ -5,7 +5,7 @@ Includes many useful constants used across the program.
 import os
 import pygame as pg
 
-from data.core import tools
+from data.core import tools, asset_pack
 from data.core.prepare import ARGS, CAPTION
 
 
@@ -22,8 +22,33 @@ HIGH_LIGHT_GREEN = (0, 232, 37)
 # Resource loading (Fonts and music just contain path names).
 FONTS = tools.load_all_fonts(os.path.join("resources", "fonts"))
 MUSIC = tools.load_all_music(os.path.join("resources", "music"))
-SFX   = tools.load_all_sfx(os.path.join("resources", "sound"))
-GFX   = tools.load_all_gfx(os.path.join("resources", "graphics"))
+
+# Font sizes used by the shared buttons and title states, opened at startup
+# rather than on first use.  Other fonts are opened as needed and the least
+# recently used are closed once tools.FONT_CACHE is full.
+FONT_WARMUP = [(FONTS["Fixedsys500c"], size) for size in (28, 30, 32, 48, 72)]
+tools.FONT_CACHE.warm(FONT_WARMUP)
+
+# Sounds and graphics are filled in asynchronously by LOADER.  The loading
+# state processes it on startup; anything else that needs them before
+# then must call LOADER.wait() first.
+# Graphics are taken from the pre-baked asset pack instead when it is current.
+PACK_PATH = "assets.pack"
+PACK = asset_pack.open_pack(PACK_PATH)
+SFX = {}
+GFX = {}
+LOADER = tools.ResourceLoader()
+LOADER.add_sfx(os.path.join("resources", "sound"), SFX)
+GFX.update(PACK and PACK.load_gfx(os.path.join("resources", "graphics")) or {})
+if not GFX:
+    LOADER.add_gfx(os.path.join("resources", "graphics"), GFX)
+
+# Shared cache for assets that are loaded and unloaded as games come and go.
+ASSET_BUDGET = 64 * 1024 * 1024
+ASSETS = tools.AssetCache(ASSET_BUDGET, PACK)
+
+# Number of left states (those that allow it) kept alive for reuse.
+STATE_POOL_SIZE = 4
 
 # Music played on program start.
 TITLE_TRACK = MUSIC["Nils_505_Feske_-_03_-_Balibulu"]
@@ -4,13 +4,24 @@ for the entire program.
 """
 
 import os
+import json
+import time
+import functools
 import pygame as pg
 
 from collections import OrderedDict
 from importlib import import_module
 
-from data.core import constants
-from data.components import state_machine
+from data.core import constants, tools
+from data.components import state_machine, metrics
+
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+
+MANIFEST_PATH = os.path.join(".", "data", "discovery_manifest.json")
 
 
 class Control(object):
@@ -23,19 +34,32 @@ class Control(object):
         self.screen = pg.display.get_surface()
         self.screen_rect = self.screen.get_rect()
         self.render_surf = pg.Surface(constants.RENDER_SIZE).convert()
+        self.render_rect = self.render_surf.get_rect()
+        self.scale_mode = constants.ARGS["scaling"]
         self.set_scale()
         self.done = False
         self.clock = pg.time.Clock()
         self.fps = 60.0
+        self.tick_rate = 120.0
+        self.max_frame_time = 250.0
         self.show_fps = False
+        self.metrics = metrics.FrameMetrics()
+        self.metrics_overlay = None
         self.now = 0.0
+        self.headless = False
         self.keys = pg.key.get_pressed()
         self.state_dict = OrderedDict()
         self.game_thumbs = OrderedDict()
+        self.thumb_paths = {}
+        self.manifest = self.load_manifest()
+        self.manifest_changed = False
         self.start_music()
         self.auto_discovery("states")
         self.auto_discovery("games")
-        self.state_machine = state_machine.StateMachine()
+        if self.manifest_changed:
+            self.save_manifest()
+        self.state_machine = state_machine.StateMachine(
+            pool_size=constants.STATE_POOL_SIZE)
 
     def start_music(self):
         pg.mixer.music.load(constants.TITLE_TRACK)
@@ -45,25 +69,109 @@ class Control(object):
 
     def auto_discovery(self, scene_folder):
         """
-        Scan a folder, load states found in it, and insert them in the
-        state_dict.  If the scenefolder is "games" it will also load the
-        lobby thumbnail for that game and place it in the game_thumbs dict.
+        Scan a folder and insert a lazily loaded state for each package found
+        in it into the state_dict; packages are only imported the first time
+        the state is started.  If the scenefolder is "games" it will also load
+        the lobby thumbnail for that game and place it in the game_thumbs dict.
+        """
+        for entry in self.discover(scene_folder):
+            package, folder = entry["scene"].rsplit(".", 1)
+            loader = functools.partial(self.load_state_from_path, folder,
+                                       package + ".")
+            self.state_dict[folder] = state_machine.LazyState(loader)
+            if scene_folder == "games":
+                self.load_thumb(folder, entry["thumb"])
+
+    def load_thumb(self, game, path):
+        """
+        Schedule the lobby thumbnail of a game to be loaded into game_thumbs
+        by the resource loader, using the default image if path is None or
+        can not be read.  The key is added immediately so game_thumbs keeps
+        discovery order.  The path used is kept in thumb_paths.
+        """
+        default = os.path.join("resources", "graphics", "default_image.png")
+        self.game_thumbs[game] = None
+        if path:
+            constants.LOADER.add(game, self.game_thumbs, self.read_thumb,
+                                 (path, default), lambda thumb: thumb.convert())
+        else:
+            path = default
+            constants.LOADER.add_image(game, path, self.game_thumbs)
+        self.thumb_paths[game] = path
+
+    @staticmethod
+    def read_thumb(path, default):
+        """
+        Load the thumbnail at path, or the image at default if it is corrupt.
+        """
+        try:
+            return pg.image.load(path)
+        except pg.error:
+            return pg.image.load(default)
+
+    def discover(self, scene_folder):
+        """
+        Return a list of entries for the packages in a scene folder; each has
+        the package name, Scene module path, thumbnail path (or None) and the
+        mtimes of the package folder and thumbnail.  The entries cached in the
+        manifest are reused if none of these mtimes have changed.
         """
         scene_folder_path = os.path.join(".", "data", scene_folder)
-        scene_package = "data.{}.".format(scene_folder)
+        folder_mtime = os.path.getmtime(scene_folder_path)
+        cached = self.manifest.get(scene_folder)
+        if cached and cached["mtime"] == folder_mtime:
+            if all(self.is_current(entry) for entry in cached["entries"]):
+                return cached["entries"]
         exclude_endings = (".py", ".pyc", "__pycache__")
+        entries = []
         for folder in os.listdir(scene_folder_path):
             if any(folder.endswith(end) for end in exclude_endings):
                 continue
-            state = self.load_state_from_path(folder, scene_package)
-            self.state_dict[folder] = state
-            if scene_folder == "games":
-                path = os.path.join(scene_folder_path, folder, "lobby_thumb.png")
-                try:
-                    thumb = pg.image.load(path).convert()
-                except pg.error:
-                    thumb = constants.GFX["default_image"]
-                self.game_thumbs[folder] = thumb
+            path = os.path.join(scene_folder_path, folder)
+            thumb = os.path.join(path, "lobby_thumb.png")
+            if not os.path.isfile(thumb):
+                thumb = None
+            paths = [p for p in (path, thumb) if p]
+            entries.append({"name" : folder,
+                            "scene" : "data.{}.{}".format(scene_folder, folder),
+                            "thumb" : thumb,
+                            "mtimes" : {p: os.path.getmtime(p) for p in paths}})
+        self.manifest[scene_folder] = {"mtime": folder_mtime, "entries": entries}
+        self.manifest_changed = True
+        return entries
+
+    @staticmethod
+    def is_current(entry):
+        """
+        Check that the files of a manifest entry are unchanged.
+        """
+        for path, mtime in entry["mtimes"].items():
+            if not os.path.exists(path) or os.path.getmtime(path) != mtime:
+                return False
+        return True
+
+    @staticmethod
+    def load_manifest():
+        """
+        Load the discovery manifest; returns an empty one if there is no
+        manifest yet or it can't be read.
+        """
+        try:
+            with open(MANIFEST_PATH) as manifest_file:
+                return json.load(manifest_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        """
+        Write the discovery manifest.  Failing to write it is not an error;
+        discovery will just scan the folders again next time.
+        """
+        try:
+            with open(MANIFEST_PATH, "w") as manifest_file:
+                json.dump(self.manifest, manifest_file, indent=1)
+        except (IOError, OSError):
+            pass
 
     @staticmethod
     def load_state_from_path(folder, package="data.states."):
@@ -83,45 +191,89 @@ class Control(object):
     def start(self, start_state):
         """
         Setup the state machine with the states we autodetected.
-        It also gives the state machine a copy of the game_thumbs dict
-        for convenience.
+        It also gives the state machine a copy of the game_thumbs and
+        thumb_paths dicts for convenience.  If resources are still loading
+        the loading state is shown first and moves on to start_state once
+        they are done.
         """
         self.state_machine.setup_states(self.state_dict)
         self.state_machine.game_thumbs = self.game_thumbs
-        self.state_machine.start_state(start_state)
+        self.state_machine.thumb_paths = self.thumb_paths
+        if constants.LOADER.done or start_state == "loading":
+            self.state_machine.start_state(start_state)
+        else:
+            self.state_machine.start_state("loading", {"next": start_state})
 
     def update(self, dt):
         """
         Checks if the state_machine is done and then updates the state_machine
         with the appropiate arguments.
         """
-        self.now = pg.time.get_ticks()
+        if self.headless:
+            self.now += dt
+        else:
+            self.now = pg.time.get_ticks()
         if self.state_machine.done:
             self.done = True
         machine_args = self.render_surf, self.keys, self.now, dt, self.scale
         self.state_machine.update(*machine_args)
 
-    def render(self):
+    def render(self, dirty=None):
         """
         Scale the render surface if not the same size as the display surface.
         The render surface is then drawn to the screen.
+        If dirty is a list of render surface rects only those regions are
+        drawn, and the list of changed screen rects is returned.  If dirty is
+        None the whole screen is drawn and None is returned.  The whole
+        screen is also drawn when regions can not be scaled on their own.
         """
-        if constants.RENDER_SIZE != self.screen_rect.size:
-            scale_args = (self.render_surf, self.screen_rect.size, self.screen)
-            pg.transform.smoothscale(*scale_args)
-        else:
-            self.screen.blit(self.render_surf, (0, 0))
+        if dirty is None or self.full_redraw or not self.scale_regions:
+            self.full_redraw = False
+            tools.scale_surface(self.render_surf, self.view, self.scale_mode)
+            return None
+        if constants.RENDER_SIZE == self.view_rect.size:
+            changed = []
+            for rect in dirty:
+                changed.append(pg.Rect(rect).move(self.view_rect.topleft))
+                self.screen.blit(self.render_surf, changed[-1], rect)
+            return changed
+        return [self.render_region(rect) for rect in dirty]
+
+    def render_region(self, rect):
+        """
+        Scale a single rect of the render surface onto the matching region of
+        the screen and return that screen rect.  The rect is grown to the
+        nearest blocks that map to a whole number of pixels on both surfaces
+        so that the region lines up with the same area of a full frame scale.
+        Smoothly scaling down may differ from a full frame by rounding only;
+        smooth upscaling would leave seams and is not done by region.
+        """
+        (block_w, screen_w), (block_h, screen_h) = self.scale_blocks
+        rect = pg.Rect(rect).clip(self.render_rect)
+        left, top = rect.x // block_w, rect.y // block_h
+        right, bottom = -(-rect.right // block_w), -(-rect.bottom // block_h)
+        width, height = right - left, bottom - top
+        source = pg.Rect(left*block_w, top*block_h, width*block_w, height*block_h)
+        target = pg.Rect(left*screen_w, top*screen_h,
+                         width*screen_w, height*screen_h)
+        target.move_ip(self.view_rect.topleft)
+        if target.w and target.h:
+            tools.scale_surface(self.render_surf.subsurface(source),
+                                self.screen.subsurface(target), self.scale_mode)
+        return target
 
     def event_loop(self):
         """
         Process all events and pass them down to the state_machine.
-        The f5 key globally turns on/off the display of FPS in the caption.
+        The f5 key globally turns on/off the display of FPS in the caption
+        and the f6 key turns on/off the frame time overlay.
         Screen resizes also handled here.
         """
         for event in pg.event.get():
             if event.type == pg.KEYDOWN:
                 self.keys = pg.key.get_pressed()
                 self.toggle_show_fps(event.key)
+                self.toggle_metrics_overlay(event.key)
                 if event.key == pg.K_PRINT:
                     # Print screen for full render-sized screencaps.
                     pg.image.save(self.render_surf, "screenshot.png")
@@ -130,6 +282,8 @@ class Control(object):
             elif event.type == pg.VIDEORESIZE:
                 self.on_resize(event.size)
                 pg.event.clear(pg.VIDEORESIZE)
+            elif event.type == pg.VIDEOEXPOSE:
+                self.full_redraw = True
             self.state_machine.get_event(event, self.scale)
 
     def on_resize(self, size):
@@ -153,10 +307,29 @@ class Control(object):
         """
         Reset the ratio of render size to window size.
         Used to make sure that mouse clicks are accurate on all resolutions.
+        Also prepares the view, the area of the screen that the render
+        surface is scaled onto, which is reused every frame.  If the view is
+        letterboxed its offset in the window is included in the scale.
         """
-        w_ratio = constants.RENDER_SIZE[0] / float(self.screen_rect.w)
-        h_ratio = constants.RENDER_SIZE[1] / float(self.screen_rect.h)
-        self.scale = (w_ratio, h_ratio)
+        self.view_rect = tools.get_view_rect(constants.RENDER_SIZE,
+                                             self.screen_rect.size,
+                                             self.scale_mode)
+        if self.view_rect != self.screen_rect:
+            self.screen.fill(pg.Color("black"))
+        self.view = self.screen.subsurface(self.view_rect)
+        w_ratio = constants.RENDER_SIZE[0] / float(self.view_rect.w)
+        h_ratio = constants.RENDER_SIZE[1] / float(self.view_rect.h)
+        self.scale = (w_ratio, h_ratio) + self.view_rect.topleft
+        self.scale_blocks = []
+        for render, view in zip(constants.RENDER_SIZE, self.view_rect.size):
+            divisor = gcd(render, view)
+            self.scale_blocks.append((render//divisor, view//divisor))
+        # Bilinear upscaling of a region clamps at its edges instead of
+        # blending in the neighbouring pixels, so it would leave seams.
+        larger = (self.view_rect.w > constants.RENDER_SIZE[0] or
+                  self.view_rect.h > constants.RENDER_SIZE[1])
+        self.scale_regions = not (self.scale_mode == "smooth" and larger)
+        self.full_redraw = True
 
     def toggle_show_fps(self, key):
         """
@@ -167,17 +340,106 @@ class Control(object):
             if not self.show_fps:
                 pg.display.set_caption(constants.CAPTION)
 
+    def toggle_metrics_overlay(self, key):
+        """
+        Press f6 to turn on/off the frame time graph overlay.
+        """
+        if key == pg.K_F6:
+            if self.metrics_overlay:
+                self.metrics_overlay = None
+                self.full_redraw = True
+            else:
+                budget = 1000.0 / self.fps
+                self.metrics_overlay = metrics.MetricsOverlay(self.metrics, budget)
+
     def main(self):
         """
         Main loop for entire program.
+        States that set interpolate are updated with a fixed timestep of
+        1000/tick_rate ms (as many times as needed to catch up with real time)
+        and are then drawn once per frame with the leftover fraction of a step
+        as the interpolation alpha.  Other states are updated once per frame
+        with the real time delta and draw themselves during update.
+        Each part of every frame is timed into self.metrics, which is
+        written to a CSV file on exit if the metrics argument was passed.
         """
+        step = 1000.0 / self.tick_rate
+        accumulator = 0.0
         while not self.done:
             time_delta = self.clock.tick(self.fps)
+            self.metrics.start_frame()
             self.event_loop()
-            self.update(time_delta)
-            self.render()
-            pg.display.update()
+            self.metrics.lap("events")
+            if self.state_machine.state.interpolate:
+                # Clamp long frames so a stall can't snowball into more updates.
+                accumulator += min(time_delta, self.max_frame_time)
+                while accumulator >= step and not self.done:
+                    self.update(step)
+                    accumulator -= step
+            else:
+                accumulator = 0.0
+                self.update(time_delta)
+            self.metrics.lap("update")
+            self.state_machine.draw(self.render_surf, accumulator / step)
+            self.metrics.lap("draw")
+            changed = self.render(self.state_machine.get_dirty_rects())
+            if self.metrics_overlay:
+                overlay_rect = self.metrics_overlay.draw(self.screen)
+                if changed is not None:
+                    changed.append(overlay_rect)
+            self.metrics.lap("render")
+            if changed is None:
+                pg.display.update()
+            elif changed:
+                pg.display.update(changed)
+            self.metrics.lap("display")
+            self.metrics.end_frame(self.state_machine.state_name, time_delta)
             if self.show_fps:
                 fps = self.clock.get_fps()
                 with_fps = "{} - {:.2f} FPS".format(constants.CAPTION, fps)
                 pg.display.set_caption(with_fps)
+        if constants.ARGS["metrics"]:
+            self.metrics.write_csv(constants.ARGS["metrics"])
+
+    def headless_main(self, steps=None):
+        """
+        Main loop for headless simulation.  The state_machine is stepped with
+        a fixed timestep of 1000/tick_rate ms as fast as the CPU allows and
+        nothing is rendered; self.now advances by simulated time rather than
+        wall clock time.  States that do not interpolate draw to the render
+        surface during update, so their drawing is included in the rate.
+        Runs until the program is done or steps updates have been made.
+        Returns the number of updates made.
+        """
+        if not self.headless:
+            self.headless = True
+            self.now = pg.time.get_ticks()
+        step = 1000.0 / self.tick_rate
+        count = 0
+        start = time.time()
+        while not self.done and (steps is None or count < steps):
+            self.event_loop()
+            self.update(step)
+            count += 1
+        elapsed = time.time() - start
+        rate = count / elapsed if elapsed else float("inf")
+        message = "{} updates ({:.1f} simulated minutes) in {:.2f}s: {:.1f} updates/s"
+        print(message.format(count, count*step/60000.0, elapsed, rate))
+        return count
+
+    def soak(self, steps):
+        """
+        Run every game headless in turn for steps updates each, printing the
+        name of each game before it starts so a crash can be traced to it.
+        Each game is switched to as the lobby would, so the previous one is
+        cleaned up first.
+        """
+        constants.LOADER.wait()
+        for game in self.game_thumbs:
+            if self.done:
+                break
+            print(game)
+            state = self.state_machine.state
+            state.next = game
+            state.done = True
+            self.headless_main(steps)
@@ -20,6 +20,12 @@ ARGS = tools.get_cli_args(CAPTION, WIN_POS, START_SIZE)
 START_SIZE = int(ARGS['size'][0]), int(ARGS['size'][1])
 
 
+# Headless runs use SDL's dummy drivers so no window or audio device is needed.
+if ARGS['headless']:
+    os.environ['SDL_VIDEODRIVER'] = "dummy"
+    os.environ['SDL_AUDIODRIVER'] = "dummy"
+
+
 # Pre-initialize the mixer for less delay before a sound plays.
 pg.mixer.pre_init(44100, -16, 1, 512)
 
@@ -6,6 +6,12 @@ Timer and simple Animation classes and various other useful tools.
 import os
 import copy
 import argparse
+import timeit
+import threading
+import weakref
+
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import pygame as pg
 
@@ -40,11 +46,56 @@ def scaled_mouse_pos(scale, pos=None):
     """
     Return the mouse position adjusted for screen size if no pos argument is
     passed and returns pos adjusted for screen size if pos is passed.
+    The scale may optionally include the (x, y) offset of the render area
+    within the window as its third and fourth items (used for letterboxing).
     """
     x,y = pg.mouse.get_pos() if pos is None else pos
+    if len(scale) > 2:
+        x, y = x-scale[2], y-scale[3]
     return (int(x*scale[0]), int(y*scale[1]))
 
 
+### Display scaling functions
+SCALE_MODES = ("smooth", "nearest", "integer")
+
+
+def get_view_rect(render_size, screen_size, mode):
+    """
+    Return the rect of the screen the render surface is scaled onto.
+    The smooth and nearest modes stretch to fill the screen.  The integer
+    mode scales by the largest whole multiple that fits, centered with
+    black bars around it; if the screen is smaller than the render size it
+    falls back to the largest size that fits with the same aspect ratio.
+    """
+    screen_rect = pg.Rect((0, 0), screen_size)
+    if mode != "integer":
+        return screen_rect
+    multiple = min(screen_size[0]//render_size[0],
+                   screen_size[1]//render_size[1])
+    if multiple:
+        size = (render_size[0]*multiple, render_size[1]*multiple)
+    else:
+        ratio = min(screen_size[0] / float(render_size[0]),
+                    screen_size[1] / float(render_size[1]))
+        size = (int(render_size[0]*ratio), int(render_size[1]*ratio))
+    return pg.Rect((0, 0), size).move(screen_rect.centerx-size[0]//2,
+                                       screen_rect.centery-size[1]//2)
+
+
+def scale_surface(source, target, mode):
+    """
+    Scale source to exactly fill the preallocated target surface using the
+    given scaling mode.  Same sized surfaces are simply blitted.
+    """
+    size = target.get_size()
+    if source.get_size() == size:
+        target.blit(source, (0, 0))
+    elif mode == "smooth":
+        pg.transform.smoothscale(source, size, target)
+    else:
+        pg.transform.scale(source, size, target)
+
+
 ### Resource loading functions.
 def load_all_gfx(directory, colorkey=(255,0,255), accept=(".png",".jpg",".bmp")):
     """
@@ -58,15 +109,22 @@ def load_all_gfx(directory, colorkey=(255,0,255), accept=(".png",".jpg",".bmp"))
         name,ext = os.path.splitext(pic)
         if ext.lower() in accept:
             img = pg.image.load(os.path.join(directory, pic))
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-                img.set_colorkey(colorkey)
-            graphics[name]=img
+            graphics[name] = convert_image(img, colorkey)
     return graphics
 
 
+def convert_image(img, colorkey=(255,0,255)):
+    """
+    Convert a loaded image to the display format, using convert_alpha() if
+    it has alpha transparency and convert() with colorkey set otherwise.
+    """
+    if img.get_alpha():
+        return img.convert_alpha()
+    img = img.convert()
+    img.set_colorkey(colorkey)
+    return img
+
+
 def _generic_resoure_loader(directory, accept):
     """
     Loads resources from given directory skipping file extensions not in accept.
@@ -117,6 +175,366 @@ def load_all_sfx(directory, accept=(".wav", ".mp3", ".ogg", ".mdi")):
     return effects
 
 
+class ResourceLoader(object):
+    """
+    Loads images and sounds asynchronously.  Files are decoded on a pool of
+    worker threads and placed in their target dicts by process, which must
+    be called on the main thread (images are converted to the display format
+    there).  Progress can be polled while loading, e.g. by a loading screen.
+    """
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(workers)
+        self.pending = deque()
+        self.total = 0
+        self.loaded = 0
+
+    def add(self, name, target, load, args=(), finish=None):
+        """
+        Schedule load(*args) on a worker; once it completes process will set
+        target[name] to the result, passed through finish if given.
+        """
+        future = self.executor.submit(load, *args)
+        self.pending.append((future, name, target, finish))
+        self.total += 1
+
+    def add_image(self, name, path, target, colorkey=(255,0,255)):
+        """
+        Schedule an image to be loaded and converted as in load_all_gfx.
+        """
+        finish = lambda img: convert_image(img, colorkey)
+        self.add(name, target, pg.image.load, (path,), finish)
+
+    def add_gfx(self, directory, target, colorkey=(255,0,255),
+                accept=(".png",".jpg",".bmp")):
+        """
+        Asynchronous equivalent of load_all_gfx, loading into target.
+        """
+        for pic in os.listdir(directory):
+            name, ext = os.path.splitext(pic)
+            if ext.lower() in accept:
+                path = os.path.join(directory, pic)
+                self.add_image(name, path, target, colorkey)
+
+    def add_sfx(self, directory, target,
+                accept=(".wav", ".mp3", ".ogg", ".mdi")):
+        """
+        Asynchronous equivalent of load_all_sfx, loading into target.
+        """
+        for fx in os.listdir(directory):
+            name, ext = os.path.splitext(fx)
+            if ext.lower() in accept:
+                path = os.path.join(directory, fx)
+                self.add(name, target, pg.mixer.Sound, (path,))
+
+    @property
+    def done(self):
+        return not self.pending
+
+    @property
+    def progress(self):
+        """
+        Fraction of scheduled resources that have been loaded.
+        """
+        return self.loaded / float(self.total) if self.total else 1.0
+
+    def process(self, time_limit=None):
+        """
+        Store resources that have finished decoding, in the order they were
+        added, spending at most time_limit milliseconds if given.
+        Errors raised while loading are raised here.  Returns self.done.
+        """
+        start = timeit.default_timer()
+        while self.pending and self.pending[0][0].done():
+            future, name, target, finish = self.pending.popleft()
+            resource = future.result()
+            target[name] = finish(resource) if finish else resource
+            self.loaded += 1
+            elapsed = (timeit.default_timer()-start) * 1000.0
+            if time_limit is not None and elapsed > time_limit:
+                break
+        return self.done
+
+    def wait(self):
+        """
+        Block until everything scheduled has been loaded.
+        """
+        while self.pending:
+            self.pending[0][0].result()
+            self.process()
+
+
+class AssetCache(object):
+    """
+    A shared cache of loaded assets with reference counting.  Assets are
+    keyed by how they were made (for images the normalized path plus the
+    conversion, colorkey and scale used), so identical requests share one
+    surface.  Each acquire must be balanced by a release; assets with no
+    references are kept for reuse but evicted least recently used first
+    whenever the total size of cached assets exceeds budget bytes.
+    Images are taken from pack (an asset_pack.AssetPack) when possible.
+    """
+    def __init__(self, budget=64*1024*1024, pack=None):
+        self.budget = budget
+        self.pack = pack
+        self.lock = threading.RLock()
+        self.assets = {}
+        self.keys = {}
+        self.references = {}
+        self.unused = OrderedDict()
+        self.size = 0
+
+    @staticmethod
+    def get_size(asset):
+        """
+        Estimate the memory used by an asset in bytes.
+        """
+        if isinstance(asset, pg.Surface):
+            return asset.get_pitch() * asset.get_height()
+        if isinstance(asset, pg.mixer.Sound):
+            return asset.get_length() * 44100 * 2
+        return 0
+
+    def acquire(self, key, factory):
+        """
+        Return the asset cached under key, creating it by calling factory
+        if it is not cached, and add a reference to it.
+        """
+        with self.lock:
+            if key not in self.assets:
+                asset = factory()
+                self.assets[key] = asset
+                self.keys[id(asset)] = key
+                self.references[key] = 0
+                self.size += self.get_size(asset)
+            self.unused.pop(key, None)
+            self.references[key] += 1
+            asset = self.assets[key]
+            self.evict()
+            return asset
+
+    def acquire_image(self, path, convert="auto", colorkey=(255,0,255),
+                      scale=None):
+        """
+        Return a loaded image.  convert is one of "auto" (as load_all_gfx),
+        "alpha" (convert_alpha), "opaque" (convert) or None (no conversion)
+        and scale is an optional size to scale the image to.
+        """
+        key = ("image", os.path.normpath(path), convert, colorkey, scale)
+        def load():
+            img = None
+            if convert == "auto" and self.pack:
+                img = self.pack.load_image(path, colorkey)
+            if img is None:
+                img = pg.image.load(path)
+                if convert == "auto":
+                    img = convert_image(img, colorkey)
+                elif convert == "alpha":
+                    img = img.convert_alpha()
+                elif convert == "opaque":
+                    img = img.convert()
+                    colorkey and img.set_colorkey(colorkey)
+            return pg.transform.scale(img, scale) if scale else img
+        return self.acquire(key, load)
+
+    def acquire_gfx(self, directory, colorkey=(255,0,255),
+                    accept=(".png",".jpg",".bmp")):
+        """
+        Cached equivalent of load_all_gfx.  Release the values of the
+        returned dict with release_all when done with them.
+        """
+        graphics = {}
+        for pic in os.listdir(directory):
+            name, ext = os.path.splitext(pic)
+            if ext.lower() in accept:
+                path = os.path.join(directory, pic)
+                graphics[name] = self.acquire_image(path, colorkey=colorkey)
+        return graphics
+
+    def release(self, asset):
+        """
+        Remove a reference to an asset returned by one of the acquire methods.
+        """
+        with self.lock:
+            key = self.keys[id(asset)]
+            self.references[key] -= 1
+            if not self.references[key]:
+                self.unused[key] = asset
+                self.evict()
+
+    def release_all(self, assets):
+        """
+        Release each asset in an iterable.
+        """
+        for asset in assets:
+            self.release(asset)
+
+    def evict(self):
+        """
+        Drop unreferenced assets, least recently used first, until the
+        cache is within budget.
+        """
+        with self.lock:
+            while self.size > self.budget and self.unused:
+                key, asset = self.unused.popitem(last=False)
+                del self.assets[key]
+                del self.keys[id(asset)]
+                del self.references[key]
+                self.size -= self.get_size(asset)
+
+
+class FontCache(object):
+    """
+    A least recently used cache of open pygame fonts keyed by (path, size),
+    holding at most limit fonts.  Fonts may be requested from any thread.
+    Evicted fonts stay usable by anything still holding them; they are just
+    opened again if requested later.  The (path, size) of every font opened
+    is remembered, without keeping it open, for get_key.
+    """
+    def __init__(self, limit=32):
+        self.limit = limit
+        self.fonts = OrderedDict()
+        self.keys = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, size):
+        """
+        Return the font at path in the given size, opening it if necessary.
+        """
+        key = (path, size)
+        with self.lock:
+            font = self.fonts.pop(key, None)
+            if font is None:
+                self.misses += 1
+                font = pg.font.Font(path, size)
+                self.keys[font] = key
+                while len(self.fonts) >= self.limit:
+                    self.fonts.popitem(last=False)
+            else:
+                self.hits += 1
+            self.fonts[key] = font
+        return font
+
+    def get_key(self, font):
+        """
+        Return the (path, size) font was opened with, or None if it was not
+        opened by this cache.
+        """
+        with self.lock:
+            return self.keys.get(font)
+
+    def warm(self, fonts):
+        """
+        Open each (path, size) in fonts ahead of their first use.
+        """
+        for path, size in fonts:
+            self.get(path, size)
+
+    def clear(self):
+        with self.lock:
+            self.fonts.clear()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.fonts
+
+    def __len__(self):
+        return len(self.fonts)
+
+
+FONT_CACHE = FontCache()
+
+
+def load_font(path, size):
+    """
+    Return a font from the shared FONT_CACHE.
+    """
+    return FONT_CACHE.get(path, size)
+
+
+class SurfaceCache(object):
+    """
+    A least recently used cache of surfaces keyed by how they were made,
+    limited to budget bytes of surfaces.  The surfaces returned are shared,
+    so they must not be drawn on or otherwise modified; copy them first if
+    that is needed.  Surfaces may be requested from any thread; factories
+    are called outside the lock, so two threads may both make a surface.
+    """
+    def __init__(self, budget=8*1024*1024):
+        self.budget = budget
+        self.surfaces = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """
+        Return the surface cached under key, creating it by calling factory
+        if it is not cached.
+        """
+        with self.lock:
+            surface = self.surfaces.pop(key, None)
+            if surface is not None:
+                self.hits += 1
+                self.surfaces[key] = surface
+                return surface
+            self.misses += 1
+        surface = factory()
+        with self.lock:
+            old = self.surfaces.pop(key, None)
+            if old is not None:
+                self.size -= old.get_pitch() * old.get_height()
+            self.size += surface.get_pitch() * surface.get_height()
+            while self.size > self.budget and self.surfaces:
+                _, old = self.surfaces.popitem(last=False)
+                self.size -= old.get_pitch() * old.get_height()
+            self.surfaces[key] = surface
+        return surface
+
+    def clear(self):
+        with self.lock:
+            self.surfaces.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.surfaces
+
+
+class TextCache(SurfaceCache):
+    """
+    A SurfaceCache of rendered text surfaces, keyed by the path and size of
+    the font and the render arguments.  Keys do not hold on to fonts opened
+    by FONT_CACHE, so they are still closed when it evicts them.
+    """
+    def render(self, font, text, antialias, color, bg=None):
+        """
+        Return font.render(text, antialias, color, bg), reusing a previous
+        surface if the same text was rendered the same way before.
+        """
+        color = tuple(parse_color(color))
+        bg = bg and tuple(parse_color(bg))
+        if bg:
+            factory = lambda: font.render(text, antialias, color, bg)
+        else:
+            factory = lambda: font.render(text, antialias, color)
+        font_key = FONT_CACHE.get_key(font) or font
+        return self.get((font_key, text, antialias, color, bg), factory)
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, antialias, color, bg=None):
+    """
+    Render text using the shared TEXT_CACHE.  The returned surface must not
+    be modified.
+    """
+    return TEXT_CACHE.render(font, text, antialias, color, bg)
+
+
 def strip_from_sheet(sheet, start, size, columns, rows=1):
     """
     Strips individual frames from a sprite sheet given a start location,
@@ -157,6 +575,14 @@ def tile_surface(size, tile, transparent=False):
     return surface
     
 
+def lerp(start, end, alpha):
+    """
+    Linearly interpolate each coordinate of a point alpha of the way from
+    start to end.
+    """
+    return tuple(a+(b-a)*alpha for a,b in zip(start, end))
+
+
 def get_cell_coordinates(rect, point, size):
     """
     Find the cell of size, within rect, that point occupies.
@@ -221,9 +647,31 @@ def get_cli_args(caption, win_pos, start_size):
     parser.add_argument('-F', '--FPS', action='store_true',
         help='show FPS in title bar')
     parser.add_argument('-p', '--profile', action='store_true',
-        help='run game with profiling')
+        help='run game with profiling, writing a stats file per state to profiles')
+    parser.add_argument('--profile_interval', type=float, metavar='MS',
+        help='profile by sampling the stack every MS milliseconds instead')
+    parser.add_argument('-M', '--metrics', metavar='CSV',
+        help='write the most recent frame timings to the file CSV on exit')
+    parser.add_argument('--scaling', choices=SCALE_MODES, default="smooth",
+        help='how the screen is scaled to the window size, default is smooth')
+    parser.add_argument('--build_pack', action='store_true',
+        help='pack all graphics into a pre-decoded asset pack and exit')
+    parser.add_argument('--benchmark',
+        choices=('scaling', 'animation', 'easing', 'buttons'),
+        help='run the named benchmark and exit')
+    parser.add_argument('-H', '--headless', action='store_true',
+        help='run without a display, stepping the game with a fixed timestep; '
+             'states still draw to the render surface while updating, so '
+             'rates include their drawing but not scaling or display')
+    parser.add_argument('--steps', type=int, default=None, metavar='N',
+        help='number of fixed updates to run in headless mode, default is unlimited')
+    parser.add_argument('--soak', action='store_true',
+        help='run every game headless for --steps updates each (default 600) '
+             'and report the update rate of each')
     args = vars(parser.parse_args())
     args['resizable'] = True
+    if args['soak']:
+        args['headless'] = True
     # Check each condition.
     if not args['center'] or (args['winpos'] != win_pos): # If -c or -w options
         args['center'] = False
@@ -5,6 +5,7 @@ This module contains the Player class for the user controlled character.
 import math
 import pygame as pg
 
+from data.core import tools
 from . import constants
 
 
@@ -22,12 +23,14 @@ class Player(pg.sprite.Sprite):
         self.image = pg.transform.rotozoom(self.original, -self.angle, 1)
         self.rect = self.image.get_rect(center=pos)
         self.true_pos = list(self.rect.center)
+        self.previous_pos = list(self.true_pos)
         self.angular_speed = 200.0
 
     def update(self, keys, bounding, dt):
         """
         Updates the players position based on currently held keys.
         """
+        self.previous_pos = list(self.true_pos)
         self.check_keys(keys, dt)
         self.true_pos[0] += self.velocity[0] * dt
         self.true_pos[1] += self.velocity[1] * dt
@@ -47,6 +50,13 @@ class Player(pg.sprite.Sprite):
         self.rect.clamp_ip(bounding)
         self.true_pos = list(self.rect.center)
 
+    def get_interpolated_pos(self, alpha):
+        """
+        Return the position of the player alpha of the way between its
+        position before and after the last update.
+        """
+        return tools.lerp(self.previous_pos, self.true_pos, alpha)
+
     def check_keys(self, keys, dt):
         """
         Call methods to check keys for both rotation and thrust.
@@ -2,6 +2,7 @@ import os
 import pygame as pg
 
 from data.core import tools
+from data.core import constants as prog_consts
 
 
 PATH = os.path.join(".", "data", "games", "space_war", "resources")
@@ -17,20 +18,27 @@ GFX = None # Loaded and Unloaded on startup and cleanup.
 def load():
     """
     Load resources. Called by the game scene on startup.
+    Resources come from the shared asset cache so reloading them after a
+    visit to the lobby is cheap.
     """
     global GFX
     if GFX is None:
-        GFX = tools.load_all_gfx(PATH)
-        GFX["ships"] = tools.load_all_gfx(os.path.join(PATH, "ships"))
-        GFX["big_stars"] = tools.tile_surface((2048, 2048), GFX["stars"], True)
+        GFX = prog_consts.ASSETS.acquire_gfx(PATH)
+        GFX["ships"] = prog_consts.ASSETS.acquire_gfx(os.path.join(PATH, "ships"))
+        stars = GFX["stars"]
+        make_stars = lambda: tools.tile_surface((2048, 2048), stars, True)
+        key = ("tiled", os.path.join(PATH, "stars"), (2048, 2048))
+        GFX["big_stars"] = prog_consts.ASSETS.acquire(key, make_stars)
 
 
 def unload():
     """
     Unload resources. Called by the game scene on cleanup.
+    Releases them to the shared asset cache to be kept or evicted.
     """
     global GFX
     if GFX:
-        GFX["ships"].clear()
+        prog_consts.ASSETS.release_all(GFX.pop("ships").values())
+        prog_consts.ASSETS.release_all(GFX.values())
         GFX.clear()
     GFX = None
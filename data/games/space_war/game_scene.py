@@ -26,6 +26,7 @@ class Scene(_State):
         super(Scene, self).__init__(controller)
         constants.load()
         self.next = None
+        self.interpolate = True
         self.screen_rect = pg.Rect((0, 0), prog_consts.RENDER_SIZE)
         machine_states = {"GAME" : states.Game(self)}
         self.state_machine = StateMachine(True)
@@ -55,6 +56,12 @@ class Scene(_State):
             self.next = "lobby"
         self.state_machine.update(surface, keys, current_time, dt, scale)
 
+    def draw(self, surface, alpha=1.0):
+        """
+        Draw the current game state interpolated by alpha.
+        """
+        self.state_machine.draw(surface, alpha)
+
     def get_event(self, event, scale):
         if event.type == pg.QUIT:
             self.done = True
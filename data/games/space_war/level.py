@@ -20,6 +20,7 @@ class Level(object):
         self.rect = self.image.get_rect()
         player.rect.center = self.rect.center
         player.true_pos = list(player.rect.center)
+        player.previous_pos = list(player.true_pos)
         self.player_singleton = pg.sprite.GroupSingle(player)
         self.make_layers()
         self.viewport = viewport
@@ -28,6 +29,7 @@ class Level(object):
         self.mid_true = list(self.mid_viewport.topleft)
         self.base_viewport = self.viewport.copy()
         self.base_true = list(self.base_viewport.topleft)
+        self.previous_views = self.get_view_positions()
 
     def make_layers(self):
         """
@@ -46,6 +48,7 @@ class Level(object):
         Updates the player and then adjusts the viewport with respect to the
         player's new position.
         """
+        self.previous_views = self.get_view_positions()
         self.player_singleton.update(keys, self.rect, dt)
         self.update_viewport()
 
@@ -67,16 +70,31 @@ class Level(object):
             self.base_true[1] += change[1]*0.1
             self.base_viewport.topleft = self.base_true
 
-    def draw(self, surface):
+    def get_view_positions(self):
+        """
+        Return the topleft of the base, mid and top viewports in that order.
+        """
+        views = (self.base_viewport, self.mid_viewport, self.viewport)
+        return [view.topleft for view in views]
+
+    def draw(self, surface, alpha=1.0):
         """
         Blit and clear actors on the self.image layer.
         Then blit appropriate viewports of all layers.
+        The player and viewports are drawn alpha of the way between their
+        positions before and after the last update.
         """
+        player = self.player_singleton.sprite
+        center = player.rect.center
+        player.rect.center = player.get_interpolated_pos(alpha)
         self.player_singleton.clear(self.image, clear_callback)
         self.player_singleton.draw(self.image)
-        surface.blit(self.base, (0,0), self.base_viewport)
-        surface.blit(self.mid_image, (0,0), self.mid_viewport)
-        surface.blit(self.image, (0,0), self.viewport)
+        player.rect.center = center
+        layers = (self.base, self.mid_image, self.image)
+        current = self.get_view_positions()
+        for layer, start, end in zip(layers, self.previous_views, current):
+            view = pg.Rect(tools.lerp(start, end, alpha), self.viewport.size)
+            surface.blit(layer, (0,0), view)
 
 
 def clear_callback(surface, rect):
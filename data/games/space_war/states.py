@@ -7,9 +7,13 @@ from . import constants, level, actors
 
 
 class Game(_State):
-    """This scene is active during the gameplay phase."""
+    """
+    This scene is active during the gameplay phase.
+    Physics run on the fixed timestep and drawing is interpolated.
+    """
     def __init__(self, controller):
         super(Game, self).__init__(controller)
+        self.interpolate = True
         self.screen_rect = pg.Rect((0, 0), prog_consts.RENDER_SIZE)
         ship = random.choice(list(constants.GFX["ships"].values()))
         self.player = actors.Player((0,0), ship)
@@ -18,8 +22,7 @@ class Game(_State):
     def update(self, surface, keys, current_time, dt, scale):
         dt /= 1000.0
         self.level.update(keys, dt)
-        self.draw(surface)
-        
-    def draw(self, surface):
+
+    def draw(self, surface, alpha=1.0):
         surface.fill(constants.BACKGROUND_COLOR)
-        self.level.draw(surface)
+        self.level.draw(surface, alpha)
@@ -3,13 +3,14 @@ The main function is defined here. It creates an instance of
 Control and starts up the main program.
 """
 
-import cProfile
-import pstats
+import os
 
 import data.core.control
+from data.components import profiling
 
 # Importing prepare sets up the screen and processes command line arguments.
 from data.core import prepare
+from data.core import asset_pack, benchmarks, constants
 
 
 def main():
@@ -18,17 +19,41 @@ def main():
     things based on supplied command line arguments, and starts the program.
     Use argument -h for details on accepted arguments.
     """
+    if prepare.ARGS['build_pack']:
+        directories = [os.path.join("resources", "graphics")]
+        games = os.path.join(".", "data", "games")
+        for game in os.listdir(games):
+            resources = os.path.join(games, game, "resources")
+            if os.path.isdir(resources):
+                directories.append(resources)
+        count = asset_pack.build_pack(constants.PACK_PATH, directories)
+        print("Packed {} images into {}".format(count, constants.PACK_PATH))
+        return
+    if prepare.ARGS['benchmark']:
+        benchmarks.run(prepare.ARGS['benchmark'])
+        return
     default_state = "snake_splash"
     straight = prepare.ARGS['straight']
     state = straight or default_state
     app = data.core.control.Control()
     app.show_fps = prepare.ARGS["FPS"]
+    if prepare.ARGS['profile']:
+        # Profile each state separately - produces a stats file per state
+        # in the profiles folder.
+        interval = prepare.ARGS['profile_interval']
+        if interval:
+            profiler = profiling.SamplingStateProfiler(interval)
+        else:
+            profiler = profiling.StateProfiler()
+        app.state_machine.profiler = profiler
     app.start(state)
-    if not prepare.ARGS['profile']:
-        app.main()
+    if prepare.ARGS['soak']:
+        app.soak(prepare.ARGS['steps'] or 600)
+    elif prepare.ARGS['headless']:
+        app.headless_main(prepare.ARGS['steps'])
     else:
-        # Run with profiling turned on - produces a 'profile' file
-        # with stats and then dumps this to the screen.
-        cProfile.runctx('app.main()', globals(), locals(), 'profile')
-        p = pstats.Stats('profile')
-        p.sort_stats('cumulative').print_stats(100)
+        app.main()
+    if prepare.ARGS['profile']:
+        profiler.stop()
+        for name in profiler.profiles:
+            print("Profile written to {}".format(profiler.get_path(name)))
@@ -2,21 +2,23 @@ import pygame as pg
 
 from data.core import constants
 from data.components.labels import FlashingText, Label
-from data.components.state_machine import _State
+from data.components.state_machine import _FlashingTextState
 
 
-class Credits(_State):
+class Credits(_FlashingTextState):
     """
     Shown by clicking the credits button in the lobby page.
     """
     def __init__(self, controller):
         super(Credits, self).__init__(controller)
+        self.poolable = True
         self.next = None
         self.screen_rect = pg.Rect((0, 0), constants.RENDER_SIZE)
         cent_x = self.screen_rect.centerx
         anykey_args = (constants.FONTS["Fixedsys500c"], 30, "[Press Any Key]",
                        pg.Color("gold"), {"center" : (cent_x, 650)}, 350)
-        self.anykey = FlashingText(*anykey_args)
+        self.flashing_text = FlashingText(*anykey_args)
+        self.background = constants.BACKGROUND_BASE
         self.titles = []
         names = ["/u/mekire", "/u/bitcraft", "/u/iminurnamez"]
         
@@ -32,18 +34,11 @@ class Credits(_State):
                            {"centerx" : self.screen_rect.centerx,
                             "centery" : self.screen_rect.centery + (i+1)*80}))
 
-    def update(self, surface, keys, current_time, dt, scale):
-        """
-        Updates the credit screen.
-        """
-        self.anykey.update(current_time)
-        self.draw(surface)
-
     def draw(self, surface):
         surface.fill(constants.BACKGROUND_BASE)
         for title in self.titles:
             title.draw(surface)
-        surface.blit(self.anykey.image, self.anykey.rect)
+        surface.blit(self.flashing_text.image, self.flashing_text.rect)
 
     def get_event(self, event, scale):
         if event.type == pg.QUIT:
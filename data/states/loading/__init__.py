@@ -0,0 +1 @@
+from .loading import Loading as Scene
@@ -0,0 +1,47 @@
+import pygame as pg
+
+from data.core import constants
+from data.components.labels import Label
+from data.components.state_machine import _State
+
+
+class Loading(_State):
+    """
+    Shown on startup while resources are loaded in the background.
+    Moves on to the state given as "next" in persist (the lobby if none is
+    given) once loading is done.
+    """
+    def __init__(self, controller):
+        super(Loading, self).__init__(controller)
+        self.screen_rect = pg.Rect((0, 0), constants.RENDER_SIZE)
+        self.bar_rect = pg.Rect(0, 0, 400, 24)
+        self.bar_rect.center = self.screen_rect.center
+        self.label = Label(constants.FONTS["Fixedsys500c"], 30, "Loading",
+                           constants.LOW_LIGHT_GREEN,
+                           {"midbottom": (self.bar_rect.centerx,
+                                          self.bar_rect.top-10)})
+
+    def startup(self, persistent):
+        super(Loading, self).startup(persistent)
+        self.next = self.persist.pop("next", "lobby")
+
+    def get_event(self, event, scale):
+        if event.type == pg.QUIT:
+            self.done = True
+            self.quit = True
+
+    def update(self, surface, keys, current_time, dt, scale):
+        """
+        Spend a little time each frame storing loaded resources.
+        """
+        if constants.LOADER.process(time_limit=8):
+            self.done = True
+        self.draw(surface)
+
+    def draw(self, surface):
+        surface.fill(constants.BACKGROUND_BASE)
+        self.label.draw(surface)
+        filled = self.bar_rect.copy()
+        filled.w = int(filled.w * constants.LOADER.progress)
+        surface.fill(constants.HIGH_LIGHT_GREEN, filled)
+        pg.draw.rect(surface, constants.LOW_LIGHT_GREEN, self.bar_rect, 2)
@@ -4,9 +4,11 @@ import pygame as pg
 from collections import OrderedDict
 
 from data.core import tools, constants
-from data.components.labels import Button, ButtonGroup
+from data.components.labels import (Button, ButtonGroup, SpatialButtonGroup,
+                                     TextBox)
+from data.components.search_index import SearchIndex
 from data.components.special_buttons import GameButton, NeonButton
-from data.components.animation import Animation
+from data.components.animation import AnimationEngine
 from data.components.state_machine import _State
 
 
@@ -17,37 +19,165 @@ class LobbyScreen(_State):
     the exit point for the game.
     """
     per_page = 6
+    page_images = tools.SurfaceCache(16*1024*1024)
 
     def __init__(self, controller):
         super(LobbyScreen, self).__init__(controller)
-        self.animations = pg.sprite.Group()
+        self.animations = AnimationEngine()
+        self.poolable = True
+        self.catalog = None
 
     def update_screen_buttons(self, games):
         screen_rect = pg.Rect((0, 0), constants.RENDER_SIZE)
-        number_of_pages = int(math.ceil(len(games) / float(self.per_page)))
-        self.loop_length = constants.RENDER_SIZE[0] * number_of_pages
-        self.game_buttons = self.make_game_pages(games, screen_rect, self.per_page)
+        self.catalog = list(games.keys())
+        self.index = SearchIndex()
+        for game in games:
+            self.index.add(game, game)
+        self.query = ""
+        self.search_box = self.make_search_box(screen_rect)
+        self.slots = self.make_slots(screen_rect)
+        self.windows = {}
+        self.button_pool = []
+        self.game_buttons = SpatialButtonGroup()
+        self.scroll_batch = None
+        self.show_games(list(games.keys()))
         nav_buttons = self.make_navigation_buttons(screen_rect)
         main_buttons = self.make_main_buttons(screen_rect)
         self.buttons = ButtonGroup(nav_buttons, main_buttons)
 
-    def make_game_pages(self, games, screen_rect, per):
-        games_list = list(games.keys())
-        groups = (games_list[i:i+per] for i in range(0, len(games), per))
+    def make_search_box(self, screen_rect):
+        """
+        Typing into this box filters the games shown; enter starts the
+        first game found.
+        """
+        rect = pg.Rect(0, 0, 300, 32)
+        rect.midtop = (screen_rect.centerx, 40)
+        font = tools.load_font(constants.FONTS["Fixedsys500c"], 24)
+        return TextBox(rect, font=font, color=constants.BACKGROUND_BASE,
+                       font_color=constants.HIGH_LIGHT_GREEN,
+                       outline_color=constants.LOW_LIGHT_GREEN,
+                       active_color=constants.HIGH_LIGHT_GREEN,
+                       command=self.start_first_game, inactive_on_enter=False)
+
+    def start_first_game(self, box_id, query):
+        if self.games:
+            self.change_state(self.games[0])
+
+    def filter_games(self, query):
+        """
+        Show only the games matching query.
+        """
+        self.query = query
+        games = self.index.search(query)
+        if games != self.games:
+            self.show_games(games)
+
+    def show_games(self, games):
+        """
+        Page through games, starting from their first page.  Any scroll in
+        progress is stopped and all buttons are recycled.
+        """
+        self.games = games
+        self.page_count = max(1, int(math.ceil(len(games) /
+                                               float(self.per_page))))
+        self.page = 0
+        self.scroll = 0
+        if self.scroll_batch is not None:
+            self.animations.cancel(self.scroll_batch)
+            self.scroll_batch = None
+        for buttons in self.windows.values():
+            self.game_buttons.remove(*buttons)
+            self.button_pool.extend(buttons)
+        self.windows = {}
+        self.materialize()
+
+    def make_slots(self, screen_rect):
+        """
+        Return the positions of the game buttons on a page.
+        """
         columns = 3
         width, height = GameButton.width, GameButton.height
         spacer_x, spacer_y = 50, 80
         start_x = (screen_rect.w - width * columns - spacer_x * (columns-1))//2
         start_y = screen_rect.top + 105
         step_x, step_y = width + spacer_x, height + spacer_y
-        buttons = ButtonGroup()
-        for offset,group in enumerate(groups):
-            offset *= constants.RENDER_SIZE[0]
-            for i,game in enumerate(group):
-                y, x = divmod(i, columns)
-                pos = (start_x + step_x * x + offset, start_y + step_y * y)
-                GameButton(pos, game, games[game], self.change_state, buttons)
-        return buttons
+        slots = []
+        for i in range(self.per_page):
+            y, x = divmod(i, columns)
+            slots.append((start_x + step_x * x, start_y + step_y * y))
+        return slots
+
+    def get_windows(self):
+        """
+        Return the offsets, in pages, from the current page of the pages
+        that can be on screen: the current page and, if there is more than
+        one, its neighbours.
+        """
+        return (-1, 0, 1) if self.page_count > 1 else (0,)
+
+    def materialize(self):
+        """
+        Make sure buttons exist for the pages in each window.  Only the
+        windows hold buttons; buttons of pages that are no longer in a
+        window are put in button_pool and reused for the pages that come
+        into view, so the number of buttons never depends on the number of
+        games.
+        """
+        for window in self.get_windows():
+            if window in self.windows:
+                continue
+            page = (self.page + window) % self.page_count
+            start = page * self.per_page
+            games = self.games[start:start+self.per_page]
+            buttons = [self.get_game_button(game) for game in games]
+            self.windows[window] = buttons
+        self.position_buttons()
+
+    def get_game_button(self, game):
+        """
+        Return a button for game, recycling one from button_pool if possible.
+        """
+        thumb = self.controller.game_thumbs[game]
+        thumb_path = getattr(self.controller, "thumb_paths", {}).get(game)
+        if self.button_pool:
+            button = self.button_pool.pop()
+            button.assign((0, 0), game, thumb, thumb_path)
+            self.game_buttons.add(button)
+            return button
+        return GameButton((0, 0), game, thumb, self.change_state,
+                          self.game_buttons, hover_call=self.controller.preload,
+                          thumb_path=thumb_path)
+
+    def position_buttons(self):
+        """
+        Move the buttons of each window to where their page currently is.
+        """
+        page_width = constants.RENDER_SIZE[0]
+        for window, buttons in self.windows.items():
+            x = window * page_width + self.scroll
+            for button, (slot_x, slot_y) in zip(buttons, self.slots):
+                button.rect.topleft = (x + slot_x, slot_y)
+        self.game_buttons.reindex()
+
+    def get_page_image(self, buttons):
+        """
+        Return a surface with the idle images of a page of game buttons and
+        its position relative to the page.  Pages are kept in page_images
+        across visits to the lobby, keyed by the games on them and the
+        versions of their images.
+        """
+        slots = self.slots[:len(buttons)]
+        bounds = buttons[0].rect.unionall([button.rect for button in buttons])
+        bounds.topleft = (min(x for x, _ in slots), min(y for _, y in slots))
+        key = tuple((button.args, GameButton.images[button.args][0])
+                    for button in buttons) + (bounds.size,)
+        def composite():
+            image = pg.Surface(bounds.size).convert_alpha()
+            image.fill((0,0,0,0))
+            for button, (x, y) in zip(buttons, slots):
+                image.blit(button.idle_image, (x-bounds.x, y-bounds.y))
+            return image
+        return self.page_images.get(key, composite), bounds.topleft
 
     def make_navigation_buttons(self, screen_rect):
         sheet = constants.GFX["nav_buttons"]
@@ -69,6 +199,7 @@ class LobbyScreen(_State):
         return buttons
 
     def make_main_buttons(self, screen_rect):
+        NeonButton.prepare([("Credits", 32), ("High Scores", 28), ("Exit", 32)])
         buttons = ButtonGroup()
         pos = (9, screen_rect.bottom-(NeonButton.height+11))
         NeonButton(pos, "Credits", 32, self.change_state, "credits", buttons)
@@ -84,26 +215,41 @@ class LobbyScreen(_State):
         return buttons
 
     def scroll_page(self, mag):
-        if not self.animations and len(self.game_buttons) > self.per_page:
-            for game in self.game_buttons:
-                self.normalize_scroll(game, mag)
-                fx, fy = game.rect.x+constants.RENDER_SIZE[0]*mag, game.rect.y
-                ani = Animation(x=fx, y=fy, duration=350.0,
-                                transition='in_out_quint', round_values=True)
-                ani.start(game.rect)
-                self.animations.add(ani)
+        """
+        Scroll to the previous (mag 1) or next (mag -1) page by animating
+        the scroll offset of the windows.
+        """
+        if not self.animations and self.page_count > 1:
+            self.scroll_batch = self.animations.animate(
+                self, scroll=constants.RENDER_SIZE[0]*mag, duration=350.0,
+                transition='in_out_quint', round_values=True,
+                callback=lambda: self.end_scroll(mag))
             constants.SFX["cardplace4"].play()
 
-    def normalize_scroll(self, game, mag):
-        if game.rect.x < 0 and mag == -1:
-            game.rect.x += self.loop_length
-        elif game.rect.x >= constants.RENDER_SIZE[0] and mag == 1:
-            game.rect.x -= self.loop_length
+    def end_scroll(self, mag):
+        """
+        Make the page scrolled to the current page, shifting the windows
+        along and recycling the buttons of the page that scrolled away.
+        """
+        self.page = (self.page - mag) % self.page_count
+        self.scroll = 0
+        self.scroll_batch = None
+        windows = {}
+        for window, buttons in self.windows.items():
+            if window + mag in self.get_windows():
+                windows[window + mag] = buttons
+            else:
+                self.game_buttons.remove(*buttons)
+                self.button_pool.extend(buttons)
+        self.windows = windows
+        self.materialize()
 
     def startup(self, persistent):
         super(LobbyScreen, self).startup(persistent)
         games = self.controller.game_thumbs
-        self.update_screen_buttons(games)
+        # A pooled lobby keeps its buttons unless the games changed.
+        if self.catalog != list(games.keys()):
+            self.update_screen_buttons(games)
 
     def exit_game(self, *args):
         self.done = True
@@ -117,6 +263,7 @@ class LobbyScreen(_State):
         if event.type == pg.QUIT:
             self.exit_game()
         else:
+            self.search_box.get_event(event, tools.scaled_mouse_pos(scale))
             self.buttons.get_event(event)
             self.game_buttons.get_event(event)
 
@@ -124,13 +271,27 @@ class LobbyScreen(_State):
         mouse_pos = tools.scaled_mouse_pos(scale)
         self.buttons.update(mouse_pos)
         self.game_buttons.update(mouse_pos)
-        self.animations.update(dt)
+        self.search_box.update()
+        if self.search_box.final != self.query:
+            self.filter_games(self.search_box.final)
+        if self.animations:
+            self.animations.update(dt)
+            self.position_buttons()
         self.draw(surface)
 
     def draw(self, surface):
         rect = surface.get_rect()
         surface.fill(constants.BACKGROUND_BASE)
+        self.search_box.draw(surface)
         self.buttons.draw(surface)
-        for button in self.game_buttons:
-            if button.rect.colliderect(rect):
-                button.draw(surface)
+        for window, buttons in self.windows.items():
+            if not buttons:
+                continue
+            image, (x, y) = self.get_page_image(buttons)
+            x += window * rect.w + self.scroll
+            page_rect = image.get_rect(topleft=(x, y))
+            if page_rect.colliderect(rect):
+                surface.blit(image, page_rect)
+                for button in buttons:
+                    if button.image is not button.idle_image:
+                        button.draw(surface)
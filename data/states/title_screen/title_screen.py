@@ -2,15 +2,16 @@ import pygame as pg
 
 from data.core import tools, constants
 from data.components.labels import FlashingText
-from data.components.state_machine import _State
+from data.components.state_machine import _FlashingTextState
 
 
-class TitleScreen(_State):
+class TitleScreen(_FlashingTextState):
     """
     Initial state of the game.
     """
     def __init__(self, controller):
         super(TitleScreen, self).__init__(controller)
+        self.poolable = True
         self.next = "lobby"
         self.screen_rect = pg.Rect((0, 0), constants.RENDER_SIZE)
         self.title = constants.GFX["collab_title"]
@@ -18,7 +19,8 @@ class TitleScreen(_State):
         self.title_rect = self.title.get_rect(centerx=cent_x, y=100)
         anykey_args = (constants.FONTS["Fixedsys500c"], 30, "[Please Insert Coin]",
                        pg.Color("gold"), {"center" : (cent_x, 650)}, 350)
-        self.anykey = FlashingText(*anykey_args)
+        self.flashing_text = FlashingText(*anykey_args)
+        self.background = constants.BACKGROUND_BASE
         
     def get_event(self, event, scale):
         if event.type == pg.QUIT:
@@ -29,11 +31,7 @@ class TitleScreen(_State):
             if event.key == pg.K_ESCAPE:
                 self.quit = True
 
-    def update(self, surface, keys, current_time, dt, scale):
-        self.anykey.update(current_time)
-        self.draw(surface)
-
     def draw(self, surface):
         surface.fill(constants.BACKGROUND_BASE)
         surface.blit(self.title, self.title_rect)
-        surface.blit(self.anykey.image, self.anykey.rect)
+        surface.blit(self.flashing_text.image, self.flashing_text.rect)
@@ -1 +1,10 @@
+"""
+Tests are run from the top level directory, e.g.
+    python -m unittest discover -s test -t .
+data.core.prepare parses the command line and opens the display when it is
+first imported, so the tests give it a headless command line.
+"""
 
+import sys
+
+sys.argv[1:] = ["--headless"]
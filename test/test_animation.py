@@ -0,0 +1,70 @@
+import unittest
+
+from data.components import animation
+from data.components.animation import AnimationEngine, Scheduler, Task
+
+
+class Target(object):
+    def __init__(self):
+        self.x = 0
+
+
+@unittest.skipIf(animation.numpy is None, "numpy is not installed")
+class TestDelayedTweens(unittest.TestCase):
+    """
+    Tweens still in their delay must not be eased nor written back.
+    """
+    def check_delayed(self, transition):
+        engine = AnimationEngine()
+        target = Target()
+        engine.animate(target, x=100, duration=100, delay=300,
+                       transition=transition)
+        engine.update(50)
+        self.assertEqual(target.x, 0)
+        engine.update(300)
+        expected = animation.get_transition(transition)(.5) * 100
+        self.assertAlmostEqual(target.x, expected)
+        engine.update(100)
+        self.assertEqual(target.x, 100)
+        self.assertEqual(len(engine), 0)
+
+    def test_linear(self):
+        self.check_delayed("linear")
+
+    def test_out_circ(self):
+        self.check_delayed("out_circ")
+
+    def test_in_circ(self):
+        self.check_delayed("in_circ")
+
+
+class TestScheduler(unittest.TestCase):
+    def test_chained_task_fires_on_next_update(self):
+        """
+        A chained task with no interval fires on the update after its
+        parent finishes, as it would in a sprite group.
+        """
+        fired = []
+        scheduler = Scheduler()
+        task = scheduler.add(Task(lambda: fired.append("parent"), 100))
+        task.chain(Task(lambda: fired.append("chained")))
+        scheduler.update(100)
+        self.assertEqual(fired, ["parent"])
+        scheduler.update(16)
+        self.assertEqual(fired, ["parent", "chained"])
+        self.assertEqual(len(scheduler), 0)
+
+    def test_chained_task_interval(self):
+        fired = []
+        scheduler = Scheduler()
+        task = scheduler.add(Task(lambda: fired.append("parent"), 100))
+        task.chain(Task(lambda: fired.append("chained"), 50))
+        scheduler.update(100)
+        scheduler.update(40)
+        self.assertEqual(fired, ["parent"])
+        scheduler.update(10)
+        self.assertEqual(fired, ["parent", "chained"])
+
+
+if __name__ == "__main__":
+    unittest.main()
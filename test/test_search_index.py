@@ -0,0 +1,62 @@
+import unittest
+
+from data.components.search_index import SearchIndex
+
+
+GAMES = ["space_war", "snake", "tetris", "breakout", "pong", "asteroids",
+         "centipede", "invaders", "war_of_words", "wasp swarm", "tic_tac_toe",
+         "dwarf_fortress"]
+
+
+def make_index():
+    index = SearchIndex()
+    for game in GAMES:
+        index.add(game, game)
+    return index
+
+
+class TestIncrementalSearch(unittest.TestCase):
+    """
+    Searching keystroke by keystroke must find the same games as a fresh
+    index searched for the final text of each keystroke.
+    """
+    def check_typing(self, text):
+        index = make_index()
+        for i in range(1, len(text)+1):
+            query = text[:i]
+            self.assertEqual(index.search(query), make_index().search(query),
+                             "after typing {!r}".format(query))
+
+    def test_prefix_grows_to_substring(self):
+        self.check_typing("war")
+
+    def test_substring_after_no_prefix(self):
+        self.check_typing("eak")
+
+    def test_second_word(self):
+        self.check_typing("sp a")
+
+    def test_substring_grows(self):
+        self.check_typing("aste")
+
+    def test_word_prefixes(self):
+        self.check_typing("t t t")
+
+    def test_backspace(self):
+        index = make_index()
+        for query in ("wa", "war", "wa", "w", "", "s", "sn", "s"):
+            self.assertEqual(index.search(query), make_index().search(query),
+                             "after typing {!r}".format(query))
+
+    def test_matches(self):
+        index = make_index()
+        self.assertEqual(index.search("wa"), ["space_war", "war_of_words",
+                                              "wasp swarm"])
+        self.assertEqual(index.search("war"), ["space_war", "war_of_words",
+                                               "wasp swarm", "dwarf_fortress"])
+        self.assertEqual(index.search("ar"), [])
+        self.assertEqual(index.search(""), GAMES)
+
+
+if __name__ == "__main__":
+    unittest.main()